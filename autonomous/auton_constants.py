@@ -206,7 +206,10 @@ DRIVING = {
             "multiplier": .7
         },
         "no_spin_power": 0.5
-    }
+    },
+    "tag_loss_grace": 0.4,  # seconds to keep steering on odometry after the tag drops out
+    "finish_confidence": 0.5,  # minimum mapped confidence to count as on target (LL_SETTINGS["filter"])
+    "setpoint_timeout": 0.1  # seconds without a new auton setpoint before the drivetrain is stopped
 }
 
 CANRANGE = {
@@ -222,3 +225,146 @@ CANRANGE = {
         "max_time": 22
     }
 }
+
+FIELD_LAYOUT = "k2025ReefscapeWelded"  # robotpy_apriltag.AprilTagField
+
+LL_SETTINGS = {
+    "transport": "rest",  # "rest" (limelight JSON client), "nt" (NetworkTables subscribers) or "replay" (vision log)
+    "nt_table": "limelight",
+    "parser": "full",  # "full" (limelightresults) or "fast" (fiducial fields only)
+    "background_ingest": False,
+    "ingest_period": 0.01,
+    "max_frame_age": 0.1,  # seconds from capture; older frames are treated as no data (None disables)
+    "rest": {
+        "call_timeout": 0.2,  # seconds a call may still be running before the next one counts it as stuck
+        "http_timeout": 0.25,  # seconds, per request, so a hung socket frees the worker
+        "max_failures": 3,
+        "probe_period": 1.0,
+        "probe_timeout": 0.5
+    },
+    "record": {"enabled": False, "path": "logs/vision.llv", "max_bytes": 16 * 1024 * 1024},
+    "replay": {"path": "logs/vision.llv", "speed": 1.0},  # speed 0: frames only advance on step()
+    "filter": {
+        "enabled": False,  # alpha-beta filter the mapped tx / yaw / distance per tag
+        "alpha": 0.5,
+        "beta": 0.1,
+        "reset_after": 0.3,  # seconds without the tag before its filter starts over
+        "settle_frames": 3,
+        "noise": {"tx": 0.3, "yaw": 0.3, "distance": 0.05}  # expected jitter in mapped units
+    },
+    "latency_compensation": {
+        "enabled": True,  # move targets by how far the robot drove/turned since the frame was captured
+        "camera_offset": (0.0, 0.0)  # meters forward, left of the robot center
+    },
+    "multi_tag": {
+        "enabled": False,  # blend the requested tag's pose from every visible tag
+        "max_tag_separation": 2.0  # meters; farther tags don't take part
+    },
+    "megatag2": {"orientation_feed": True},  # send the drivetrain yaw to the camera every frame
+    "fiducial_filter": {
+        # Only detect the tag ids that running commands asked for. The camera's MegaTag botpose
+        # is filtered too, so this stays off while POSE_FUSION is running; POSE_FUSION is enabled
+        # by default, so turn that off for this to take effect.
+        "enabled": True,
+        "pipeline_key": "fiducial_idfilters"
+    },
+    "discovery": {
+        "scan_timeout": 1,
+        "backoff_initial": 0.5,
+        "backoff_max": 8,
+        "monitor_period": 0.25,
+        "lost_after": 1.0
+    }
+}
+
+LL_PIPELINES = {
+    "enabled": False,
+    # Ordered near -> far; "up_to" is the far edge of the band in meters (None = no limit)
+    "bands": [
+        {"name": "near", "index": 1, "up_to": 1.8},  # low resolution, highest frame rate for alignment
+        {"name": "far", "index": 0, "up_to": None}  # high resolution so far tags are detected at all
+    ],
+    "hysteresis": 0.25,
+    "min_switch_interval": 0.5,
+    "lost_after": 0.5
+}
+
+POSE_FUSION = {
+    "enabled": True,
+    # "megatag2": the gyro-constrained botpose_orb_wpiblue when the camera has one, else botpose_wpiblue
+    "pose_source": "megatag2",
+    # Kalman filter trust in the camera pose: x, y (meters), heading (radians), for one tag
+    # at distance_scale meters. Grows with the square of the average tag distance, with
+    # ambiguity and with spin, and shrinks with the number of tags.
+    "std_devs": {
+        "xy": 0.5,
+        "theta": 0.9,
+        "single_tag_theta": 9999999,  # heading from one tag is left to the gyro
+        "distance_scale": 2.0,
+        "ambiguity_gain": 5.0,  # per unit of ambiguity (0-1)
+        "spin_gain": 0.5  # per rad/s of robot angular velocity
+    },
+    "reject": {
+        "max_ambiguity": 0.3,  # single-tag frames only
+        "max_distance": 6.0,  # meters, average tag distance
+        "max_angular_velocity": 4.0,  # rad/s, images smear and latency errors grow
+        "max_jump": 1.0,  # meters from the current estimate
+        "reset_after": 10  # this many jumps in a row means the estimate is wrong: reset it to the camera
+    },
+    "field": {"length": 17.548, "width": 8.052},  # poses outside the field are rejected
+    # While disabled, seed the estimate from an average of multi-tag poses instead of a fixed start pose
+    "relocalize": {
+        "enabled": True,
+        "min_tags": 2,
+        "max_distance": 4.0,  # meters, average tag distance
+        "samples": 10,  # frames averaged per seed
+        "max_spread": 0.05,  # meters; samples farther than this from their average are too noisy to use
+        "reseed_distance": 0.10,  # re-seed while still disabled if the estimate is off by this much...
+        "reseed_heading": 3.0  # ...or by this many degrees
+    }
+}
+
+SCORING = {
+    # Reef tags per alliance; the driver's seek_and_shoot goes for the nearest one of ours
+    "tag_ids": {
+        "red": [6, 7, 8, 9, 10, 11],
+        "blue": [17, 18, 19, 20, 21, 22]
+    },
+    "max_distance": 3.0,  # meters from the robot; farther than this, fall back to the closest tag in view
+    "hysteresis": 0.3,  # meters another face has to be closer by before the selection moves
+    "cache_path": "logs/scoring_poses.json",
+    "poses": {
+        "branch_offset": 0.1643,  # meters from the tag center to each branch
+        "lateral_offset": 0.0,  # meters the scoring mechanism sits right of the robot center
+        "standoff": 0.45,  # meters from the tag face to the robot center when scoring
+        "approach_distance": 0.5  # meters farther out for the line-up pose
+    },
+    # Heading-locked approach: P control on position, the request's PID on heading
+    "approach": {
+        "kp": 2.5,
+        "max_speed": 1.5,  # m/s
+        "line_up_tolerance": 0.10,  # meters from the line-up pose before heading in to score
+        "position_tolerance": 0.03,  # meters
+        "heading_tolerance": 2.0,  # degrees
+        "heading_kp": 6.0,
+        "heading_kd": 0.1,
+        "timeout": 5.0  # seconds
+    }
+}
+
+# CommandSwerveDrivetrain.drive_to_pose(): profiled distance-to-goal and heading control on the fused pose.
+# Pass a dict with any of these keys as "constraints" to override them for one move.
+DRIVE_TO_POSE = {
+    "max_velocity": 2.0,  # m/s, along the line to the goal
+    "max_acceleration": 3.0,  # m/s^2
+    "max_angular_velocity": 3.0,  # rad/s
+    "max_angular_acceleration": 6.0,  # rad/s^2
+    "translation_kp": 4.0,
+    "translation_kd": 0.0,
+    "heading_kp": 5.0,
+    "heading_kd": 0.0,
+    "position_tolerance": 0.02,  # meters
+    "heading_tolerance": 1.5,  # degrees
+    "velocity_tolerance": 0.05,  # m/s (and rad/s) the robot has to have settled to
+    "timeout": 4.0  # seconds
+}
@@ -4,13 +4,16 @@ import math
 from phoenix6.hardware import CANrange
 from phoenix6.configs import TalonFXConfiguration, Slot0Configs, CANrangeConfiguration
 from phoenix6.configs.config_groups import ToFParamsConfigs, FovParamsConfigs
+from phoenix6 import swerve
 
-from autonomous.auton_constants import DRIVING, LL_DATA_SETTINGS, CANRANGE
+from autonomous.auton_constants import DRIVING, LL_DATA_SETTINGS, CANRANGE, SCORING
+from handlers.drive_setpoint import DriveSetpointMailbox
+from handlers.scoring_targets import get_scoring_pose_table
 
 
 class AutonDrive(SubsystemBase):
 
-    def __init__(self, drivetrain, _drive, _max_speed, _max_angular_rate, limelight_handler):
+    def __init__(self, drivetrain, _drive, _max_speed, _max_angular_rate, vision):
         print(f"+++++ AUTON DR I")
         super().__init__()
 
@@ -19,7 +22,25 @@ class AutonDrive(SubsystemBase):
         self._drive = _drive
         self.drivetrain = drivetrain
 
-        self.limelight_handler = limelight_handler
+        self.vision = vision
+
+        # Times AutonDrive.limelight() got its tag back inside the grace window, or gave up
+        self.tag_loss_saves = 0
+        self.tag_loss_aborts = 0
+
+        # Field-centric (blue origin) drive that holds a heading while translating
+        const = SCORING["approach"]
+        self._drive_facing = (
+            swerve.requests.FieldCentricFacingAngle()
+            .with_forward_perspective(swerve.requests.ForwardPerspectiveValue.BLUE_ALLIANCE)
+            .with_heading_pid(const["heading_kp"], 0, const["heading_kd"])
+        )
+
+        # Auton commands write setpoints here; one drivetrain command applies them
+        self.setpoints = DriveSetpointMailbox(drivetrain, {
+            DriveSetpointMailbox.ROBOT_CENTRIC: self._drive,
+            DriveSetpointMailbox.FACING_ANGLE: self._drive_facing
+        }, DRIVING["setpoint_timeout"])
 
         self.sensors = {
             "right": {
@@ -127,31 +148,33 @@ class AutonDrive(SubsystemBase):
 
             def initialize(self):
                 print(f"+++++ AUTON DR limelight I")
+                self.outer_self.vision.subscribe(self.target_tag_id)
 
             def execute(self):
 
                 print(f"+++++ AUTON DR limelight ::: Seeking")
-                result = self.outer_self.limelight_handler.get_target_data(self.target_tag_id)
+                result = self.outer_self.vision.get_target_data(self.target_tag_id)
                 if result:
                     # print(f"+++++ AUTON DR limelight ::: >> Found <<")
-                    # print(f"+++++ AUTON DR limelight ::: >> ID  : {result["tag_id"]} "
-                    #       f" Or Y: {result["yaw"]:.3f}  "
-                    #       f" Mp Y: {result["mapped"]["yaw"]:.3f}  "
-                    #       f" tx  : {result["tx"]:.3f}  "
-                    #       f" Dist: {result["distance"]:.3f}   <<")
-
-                    mapped = result["mapped"]
-
-                    print(f"+++++ AUTON DR limel_map ::: // ID  : {result["tag_id"]} "
-                          f" Or Y: {mapped["yaw"]:.3f}  "
-                          f" tx  : {mapped["tx"]:.3f}  "
-                          f" Dist: {mapped["distance"]:.3f}   "
+                    # print(f"+++++ AUTON DR limelight ::: >> ID  : {result.tag_id} "
+                    #       f" Or Y: {result.yaw:.3f}  "
+                    #       f" Mp Y: {result.mapped.yaw:.3f}  "
+                    #       f" tx  : {result.tx:.3f}  "
+                    #       f" Dist: {result.distance:.3f}   <<")
+
+                    mapped = result.mapped
+
+                    print(f"+++++ AUTON DR limel_map ::: // ID  : {result.tag_id} "
+                          f" Or Y: {mapped.yaw:.3f}  "
+                          f" tx  : {mapped.tx:.3f}  "
+                          f" Dist: {mapped.distance:.3f}   "
                           f" Targ: {self.target_tag_id}//")
 
-                    if self.target_tag_id is not None and mapped["id"] != self.target_tag_id:
+                    if self.target_tag_id is not None and mapped.id != self.target_tag_id:
                         self.on_target = True
 
             def end(self, interrupted):
+                self.outer_self.vision.unsubscribe(self.target_tag_id)
                 if interrupted:
                     print(f"+++++ AUTON DR limelight Interrupted")
                 else:
@@ -170,9 +193,9 @@ class AutonDrive(SubsystemBase):
                         return v_input
 
                 return {
-                    "yaw": do_multiplier("yaw", result["yaw"]),
-                    "tx": do_multiplier("tx", result["tx"]),
-                    "distance": do_multiplier("distance", result["distance"])
+                    "yaw": do_multiplier("yaw", result.yaw),
+                    "tx": do_multiplier("tx", result.tx),
+                    "distance": do_multiplier("distance", result.distance)
                 }
 
         # Create and return the command
@@ -195,41 +218,67 @@ class AutonDrive(SubsystemBase):
                 self.speed_x = None
                 self.speed_y = None
                 self.rotation = None
+                self.last_target = None
+                self.last_seen_pose = None
+                self.lost_since = None
+                self.confidence = 1.0
+                self.yaw_known = True
                 # self.addRequirements(outer_self.drivetrain)
 
             def initialize(self):
                 print(f"+++++ AUTON DR limelight I target: {self.target_tag_id}")
+                self.outer_self.vision.subscribe(self.target_tag_id)
+                self.last_target = None
+                self.last_seen_pose = None
+                self.lost_since = None
 
             def execute(self):
 
                 # print(f"+++++ AUTON DR limelight ::: Seeking")
-                result = self.outer_self.limelight_handler.get_target_data(self.target_tag_id)
+                result = self.outer_self.vision.get_target_data(self.target_tag_id)
+                # With the requested tag out of view the handler hands back the closest one instead
+                if result and (self.target_tag_id is None or result.tag_id == self.target_tag_id):
+                    if self.lost_since is not None:
+                        self.outer_self.tag_loss_saves += 1
+                        print(f"+++++ AUTON DR limelight REACQUIRED after "
+                              f"{Timer.getFPGATimestamp() - self.lost_since:.2f}s "
+                              f"(saves: {self.outer_self.tag_loss_saves})")
+                        self.lost_since = None
+                    self.last_target = result
+                    self.last_seen_pose = self.outer_self.drivetrain.get_state().pose
+                else:
+                    result = self.predict_lost_target()
+
                 if result:
 
-                    mapped = result["mapped"]
+                    mapped = result.mapped
                     # print(f"+++++ AUTON DR limelight ::: >> Found <<")
-                    # print(f"+++++ AUTON DR limelight ::: >> ID  : {result["tag_id"]} "
-                    #       f" Or Y: {mapped["yaw"]:.3f}  "
-                    #       f" tx  : {mapped["tx"]:.3f}  "
-                    #       f" Dist: {mapped["distance"]:.3f}   <<")
+                    # print(f"+++++ AUTON DR limelight ::: >> ID  : {result.tag_id} "
+                    #       f" Or Y: {mapped.yaw:.3f}  "
+                    #       f" tx  : {mapped.tx:.3f}  "
+                    #       f" Dist: {mapped.distance:.3f}   <<")
 
-                    if self.target_tag_id is not None and mapped["id"] != self.target_tag_id:
+                    if self.target_tag_id is not None and mapped.id != self.target_tag_id:
                         self.on_target = True
                         return
 
-                    self.distance = mapped["distance"]
+                    self.distance = mapped.distance
+                    self.confidence = mapped.confidence
                     # self.speed_x = 0
                     # self.speed_y = 0
                     # self.rotation = 0
-                    self.speed_x = self.calculate_drive_variable("speed_x", mapped["distance"])
-                    self.speed_y = self.calculate_drive_variable("speed_y", mapped["tx"])
-                    self.rotation = self.calculate_drive_variable("rotation", mapped["yaw"])
+                    self.speed_x = self.calculate_drive_variable("speed_x", mapped.distance)
+                    self.speed_y = self.calculate_drive_variable("speed_y", mapped.tx)
+                    # Over NT a tag that isn't the primary target has no orientation (NaN):
+                    # hold the heading, and don't call it on target, until the yaw comes back
+                    self.yaw_known = not math.isnan(mapped.yaw)
+                    self.rotation = self.calculate_drive_variable("rotation", mapped.yaw) if self.yaw_known else 0
 
                     print(f"+++++ AUTON DR move ::: >> "
                           f" D: {self.distance}  "
-                          f" X: {mapped["distance"]:.3f} -> {self.speed_x:.3f}  "
-                          f" Y: {mapped["tx"]:.3f} -> {self.speed_y:.3f}  "
-                          f" R: {mapped["yaw"]:.3f} -> {self.rotation:.3f}   <<")
+                          f" X: {mapped.distance:.3f} -> {self.speed_x:.3f}  "
+                          f" Y: {mapped.tx:.3f} -> {self.speed_y:.3f}  "
+                          f" R: {mapped.yaw:.3f} -> {self.rotation:.3f}   <<")
 
                     self.on_target = self.calculate_finished()
 
@@ -238,7 +287,22 @@ class AutonDrive(SubsystemBase):
                     print(f"+++++ AUTON DR limelight LOST")
                     self.on_target = True
 
+            def predict_lost_target(self):
+                """Odometry prediction of the lost tag while inside the grace window, else None"""
+                if self.last_target is None:
+                    return None
+
+                now = Timer.getFPGATimestamp()
+                if self.lost_since is None:
+                    self.lost_since = now
+                if now - self.lost_since > DRIVING["tag_loss_grace"]:
+                    self.outer_self.tag_loss_aborts += 1
+                    self.last_target = None
+                    return None
+                return self.outer_self.vision.predict_target(self.last_target, self.last_seen_pose)
+
             def end(self, interrupted):
+                self.outer_self.vision.unsubscribe(self.target_tag_id)
                 if interrupted:
                     print(f"+++++ AUTON DR limelight Interrupted")
                 else:
@@ -287,9 +351,12 @@ class AutonDrive(SubsystemBase):
             def calculate_finished(self):
                 const = DRIVING
                 print(f"FIN {self.speed_x} {self.speed_y} {self.rotation}")
+                # A filtered reading has to have settled before it counts (always 1 unfiltered)
                 if (abs(self.speed_x) < const["speed_x"]["no_spin_power"]
                         and abs(self.speed_y) < const["speed_y"]["no_spin_power"]
-                        and abs(self.rotation) < const["rotation"]["no_spin_power"]):
+                        and abs(self.rotation) < const["rotation"]["no_spin_power"]
+                        and self.confidence >= const["finish_confidence"]
+                        and self.yaw_known):
                     print(f"+++++ AUTON DR limelight ON TARGET")
                     return True
                 else:
@@ -298,6 +365,72 @@ class AutonDrive(SubsystemBase):
         # Create and return the command
         return LimelightCommand(self, target_tag_id, intake)
 
+    def approach_scoring_pose(self, tag_id, side='left') -> Command:
+        """
+        Creates a command that drives to the tag's scoring pose for one branch (see
+        ScoringPoseTable), through its line-up pose, holding the scoring heading the whole way.
+        """
+
+        class ApproachScoringPoseCommand(Command):
+            def __init__(self, outer_self, _tag_id, _side):
+                super().__init__()
+                self.outer_self = outer_self
+                self.tag_id = _tag_id
+                self.side = _side
+                table = get_scoring_pose_table()
+                self.waypoints = [table.approach_pose(_tag_id, _side), table.scoring_pose(_tag_id, _side)]
+                self.heading = table.heading(_tag_id)
+                self.index = 0
+                self.timer = Timer()
+                # self.addRequirements(outer_self.drivetrain)
+
+            def initialize(self):
+                print(f"+++++ AUTON DR approach_scoring_pose I tag: {self.tag_id} {self.side}")
+                self.index = 0
+                self.timer.restart()
+
+            def execute(self):
+                const = SCORING["approach"]
+                pose = self.outer_self.drivetrain.get_state().pose
+                target = self.waypoints[self.index]
+                dx = target.x - pose.x
+                dy = target.y - pose.y
+                distance = math.hypot(dx, dy)
+
+                # Line-up pose only has to be passed close by, the scoring pose is the real target
+                if self.index == 0 and distance < const["line_up_tolerance"]:
+                    self.index = 1
+                    return self.execute()
+
+                speed = min(const["kp"] * distance, const["max_speed"])
+                vx = speed * dx / distance if distance > 0 else 0
+                vy = speed * dy / distance if distance > 0 else 0
+                self.outer_self._drive_robot_facing(self.heading, vx, vy)
+
+            def end(self, interrupted):
+                if interrupted:
+                    print(f"+++++ AUTON DR approach_scoring_pose Interrupted")
+                else:
+                    print(f"+++++ AUTON DR approach_scoring_pose End")
+
+                self.outer_self._drive_robot(0, 0, 0)
+
+            def isFinished(self):
+                const = SCORING["approach"]
+                if self.timer.hasElapsed(const["timeout"]):
+                    print(f"+++++ AUTON DR approach_scoring_pose TIMEOUT")
+                    return True
+                if self.index == 0:
+                    return False
+                pose = self.outer_self.drivetrain.get_state().pose
+                target = self.waypoints[1]
+                heading_error = abs((pose.rotation() - self.heading).degrees())
+                return (pose.translation().distance(target.translation()) < const["position_tolerance"]
+                        and heading_error < const["heading_tolerance"])
+
+        # Create and return the command
+        return ApproachScoringPoseCommand(self, tag_id, side)
+
     def align_pipe(self, direction='left', move=True) -> Command:
         """
         Creates a command that turns the robot until the simulated target distance is 1.0.
@@ -458,7 +591,9 @@ class AutonDrive(SubsystemBase):
     def _drive_robot(self, rotation=0, x=0, y=0):
 
         """Helper method to apply drive commands."""
-        # Directly use the drive request without creating a new command
-        self.drivetrain.apply_request(lambda: (
-            self._drive.with_rotational_rate(rotation).with_velocity_y(y).with_velocity_x(x)
-        )).schedule()
+        # Only updates the mailbox; its long-lived command does the driving
+        self.setpoints.write(x, y, rotation)
+
+    def _drive_robot_facing(self, heading, x=0, y=0):
+        """Field-centric (blue origin) x, y while the heading PID turns to heading (Rotation2d)"""
+        self.setpoints.write(x, y, request_type=DriveSetpointMailbox.FACING_ANGLE, heading=heading)
@@ -0,0 +1,71 @@
+"""
+Parse time per Limelight frame: full limelightresults parser vs. the fast fiducial-only path.
+
+Run from the project root:
+    python -m benchmarks.limelight_parse
+"""
+import json
+import timeit
+
+import limelightresults
+
+from handlers.limelight_handler import parse_fast
+
+
+def _fiducial(tag_id):
+    return {
+        "fID": tag_id, "fam": "36H11C",
+        "pts": [[412.1, 210.4], [470.9, 211.0], [471.3, 268.2], [411.8, 267.7]],
+        "skew": [], "ta": 0.0043, "tx": -4.21, "txp": 441.5, "ty": 3.17, "typ": 239.4,
+        "t6c_ts": [0.31, -0.12, -2.41, 1.2, -7.9, 0.4],
+        "t6r_fs": [5.12, 3.98, 0.0, 0.0, 0.0, 61.3],
+        "t6r_ts": [0.29, 0.0, -2.52, 0.0, -7.9, 0.0],
+        "t6t_cs": [-0.18, 0.09, 2.43, -1.1, 7.9, -0.3],
+        "t6t_rs": [-0.2, 0.31, 2.5, 0.0, 7.9, 0.0]
+    }
+
+
+def _detector(class_id):
+    return {
+        "class": "algae", "classID": class_id, "conf": 0.81,
+        "pts": [[100, 100], [150, 100], [150, 150], [100, 150]],
+        "ta": 0.02, "tx": 10.2, "txp": 125, "ty": -3.4, "typ": 125
+    }
+
+
+def _retro():
+    return {
+        "pts": [[10, 10], [20, 10], [20, 20], [10, 20]],
+        "t6c_ts": [0] * 6, "t6r_fs": [0] * 6, "t6r_ts": [0] * 6, "t6t_cs": [0] * 6, "t6t_rs": [0] * 6,
+        "ta": 0.01, "tx": 1.0, "txp": 15, "ty": 1.0, "typ": 15
+    }
+
+
+def sample_frame(n_fiducials=3):
+    """A frame shaped like the camera's websocket JSON, with a few of every result type"""
+    return json.loads(json.dumps({
+        "Barcode": [],
+        "Classifier": [{"class": "coral", "classID": 1, "conf": 0.9}],
+        "Detector": [_detector(i) for i in range(4)],
+        "Fiducial": [_fiducial(tag_id) for tag_id in (17, 18, 22, 21, 20)[:n_fiducials]],
+        "Retro": [_retro() for _ in range(2)],
+        "botpose": [1.2, 0.5, 0.0, 0.0, 0.0, 61.3],
+        "botpose_wpiblue": [5.12, 3.98, 0.0, 0.0, 0.0, 61.3],
+        "botpose_wpired": [12.4, 4.03, 0.0, 0.0, 0.0, -118.7],
+        "cl": 11.6, "pID": 0, "tl": 19.3, "ts": 481297.2, "v": 1
+    }))
+
+
+def main(iterations=20000):
+    for n_fiducials in (1, 3, 5):
+        frame = sample_frame(n_fiducials)
+        full_s = timeit.timeit(lambda: limelightresults.parse_results(frame), number=iterations)
+        fast_s = timeit.timeit(lambda: parse_fast(frame), number=iterations)
+        full_us = full_s / iterations * 1e6
+        fast_us = fast_s / iterations * 1e6
+        print(f"{n_fiducials} tags   full: {full_us:7.2f} us/frame   fast: {fast_us:7.2f} us/frame   "
+              f"speedup: {full_us / fast_us:4.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Replay a recorded vision log through LimelightHandler and the LimelightCommand logic,
+as fast as possible, and report the time per frame plus what the command would have done.
+
+Record on the robot with LL_SETTINGS["record"]["enabled"] = True, copy the log off, then
+run from the project root:
+    python -m benchmarks.vision_replay logs/vision.llv [target_tag_id]
+"""
+import contextlib
+import io
+import sys
+import time
+from types import SimpleNamespace
+
+from wpimath.geometry import Pose2d
+
+from autonomous.auton_drive import AutonDrive
+from handlers.limelight_handler import LimelightHandler
+from handlers.vision_log import VisionReplaySource
+from handlers.vision_service import VisionService
+
+
+def main(path, target_tag_id=None):
+    replay = VisionReplaySource(path, speed=0)
+    handler = LimelightHandler(transport="replay", replay=replay)
+    vision = VisionService(handler)
+
+    # Stand-in for AutonDrive: the command needs the vision service, _drive_robot, the
+    # tag-loss counters and a drivetrain pose (a robot standing still at the origin)
+    drive_calls = []
+    state = SimpleNamespace(pose=Pose2d())
+    outer = SimpleNamespace(
+        vision=vision, drivetrain=SimpleNamespace(get_state=lambda: state),
+        tag_loss_saves=0, tag_loss_aborts=0,
+        _drive_robot=lambda rotation, x, y: drive_calls.append((x, y, rotation)))
+    command = AutonDrive.limelight(outer, target_tag_id)
+    command.initialize()
+
+    frames = 0
+    on_target_at = None
+    elapsed = 0.0
+    with contextlib.redirect_stdout(io.StringIO()):
+        while replay.step():
+            start = time.perf_counter()
+            vision.periodic()
+            command.execute()
+            elapsed += time.perf_counter() - start
+            frames += 1
+            if command.isFinished() and on_target_at is None:
+                on_target_at = frames
+                command.on_target = False  # Keep going to the end of the log
+        command.end(False)
+
+    print(f"{frames} frames   {elapsed / max(frames, 1) * 1e6:.1f} us/frame (periodic + execute)")
+    print(f"drive commands: {len(drive_calls)}   first finished at frame: {on_target_at}")
+    print(f"tag loss: {outer.tag_loss_saves} saves, {outer.tag_loss_aborts} aborts")
+    if drive_calls:
+        for name, values in zip(("speed_x", "speed_y", "rotation"), zip(*drive_calls)):
+            print(f"  {name:9s} min {min(values):7.3f}  max {max(values):7.3f}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else None)
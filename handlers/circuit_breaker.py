@@ -0,0 +1,104 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class CircuitBreaker:
+    """
+    Runs blocking calls (Limelight REST requests) on one worker thread. A call that
+    raises, or that is still running call_timeout after it started when the next one
+    comes in, is a failure. After max_failures failures in a row the breaker opens:
+    calls are refused right away and a background probe retries until the device
+    answers again, which closes the breaker.
+    """
+
+    def __init__(self, name, probe, call_timeout, max_failures, probe_period, probe_timeout):
+        self.name = name
+        self.probe = probe
+        self.call_timeout = call_timeout
+        self.max_failures = max_failures
+        self.probe_period = probe_period
+        self.probe_timeout = probe_timeout
+
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.total_failures = 0
+        self.trips = 0
+
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+        self._pending = None
+        self._pending_started = 0
+        self._probe_thread = None
+        self._lock = threading.Lock()
+
+    def is_open(self):
+        return self.state == "open"
+
+    def submit(self, fn, *args):
+        """Run fn(*args) on the worker without waiting for it; its outcome counts toward the breaker"""
+        future = self._submit(fn, *args)
+        if future is not None:
+            future.add_done_callback(self._on_done)
+        return future is not None
+
+    def _submit(self, fn, *args):
+        # The probe thread replaces _pending too, so it is only touched under the lock
+        with self._lock:
+            if self.state == "open":
+                return None
+            if self._pending is None or self._pending.done():
+                self._pending_started = time.monotonic()
+                self._pending = self._executor.submit(fn, *args)
+                return self._pending
+            stuck = time.monotonic() - self._pending_started > self.call_timeout
+
+        # The previous request is still running; don't queue more work behind it, and
+        # count it once it has been stuck past the deadline
+        if stuck:
+            self._record_failure(TimeoutError("previous call still pending"))
+        return None
+
+    def _on_done(self, future):
+        # Slow but successful calls are fine; only errors (HTTP timeouts included) count
+        if future.exception() is not None:
+            self._record_failure(future.exception())
+        else:
+            self._record_success()
+
+    def _record_success(self):
+        with self._lock:
+            self.consecutive_failures = 0
+
+    def _record_failure(self, error):
+        with self._lock:
+            self.consecutive_failures += 1
+            self.total_failures += 1
+            if self.state == "closed" and self.consecutive_failures >= self.max_failures:
+                self.state = "open"
+                self.trips += 1
+                print(f"##### {self.name}: circuit OPEN after {self.consecutive_failures} failures ({error!r})")
+                self._start_probe()
+
+    def _start_probe(self):
+        if self._probe_thread is not None and self._probe_thread.is_alive():
+            return
+        self._probe_thread = threading.Thread(target=self._probe_loop, name=f"{self.name}Probe", daemon=True)
+        self._probe_thread.start()
+
+    def _probe_loop(self):
+        while self.state == "open":
+            time.sleep(self.probe_period)
+            with self._lock:
+                if self._pending is not None and not self._pending.done():
+                    continue
+                self._pending_started = time.monotonic()
+                probe = self._pending = self._executor.submit(self.probe)
+            try:
+                ok = bool(probe.result(timeout=self.probe_timeout))
+            except Exception:
+                ok = False
+            if ok:
+                with self._lock:
+                    self.state = "closed"
+                    self.consecutive_failures = 0
+                print(f"##### {self.name}: circuit CLOSED, device answering again")
@@ -0,0 +1,63 @@
+from wpilib import Timer
+
+
+class DriveSetpointMailbox:
+    """
+    Latest drive setpoint written by the auton commands, applied to the drivetrain by
+    one long-lived command. Writers only overwrite the fields, so nothing is allocated
+    or rescheduled per loop. If nobody writes for timeout seconds the command drives
+    zeros, so a command that stops writing without stopping the robot can't leave it
+    running away.
+
+    requests maps request types to phoenix6 swerve requests: ROBOT_CENTRIC takes
+    vx, vy, omega; FACING_ANGLE takes vx, vy and the heading to hold.
+    """
+
+    ROBOT_CENTRIC = "robot_centric"
+    FACING_ANGLE = "facing_angle"
+
+    def __init__(self, drivetrain, requests, timeout):
+        self.drivetrain = drivetrain
+        self.requests = requests
+        self.timeout = timeout
+
+        self.vx = 0.0
+        self.vy = 0.0
+        self.omega = 0.0
+        self.heading = None
+        self.request_type = self.ROBOT_CENTRIC
+        self.timestamp = None
+
+        self.stale = True
+        self.stale_count = 0
+
+        self.command = drivetrain.run(self._apply)
+        self.command.setName("DriveSetpointMailbox")
+
+    def write(self, vx=0.0, vy=0.0, omega=0.0, request_type=ROBOT_CENTRIC, heading=None):
+        """Set the setpoint and make sure the drive command is running"""
+        self.vx = vx
+        self.vy = vy
+        self.omega = omega
+        self.request_type = request_type
+        self.heading = heading
+        self.timestamp = Timer.getFPGATimestamp()
+        if not self.command.isScheduled():
+            self.command.schedule()
+
+    def _apply(self):
+        stale = self.timestamp is None or Timer.getFPGATimestamp() - self.timestamp > self.timeout
+        if stale and not self.stale:
+            self.stale_count += 1
+            print(f"##### Drive setpoint stale, stopping (count: {self.stale_count})")
+        self.stale = stale
+
+        if stale:
+            request = self.requests[self.ROBOT_CENTRIC].with_velocity_x(0).with_velocity_y(0).with_rotational_rate(0)
+        elif self.request_type == self.FACING_ANGLE:
+            request = (self.requests[self.FACING_ANGLE].with_target_direction(self.heading)
+                       .with_velocity_x(self.vx).with_velocity_y(self.vy))
+        else:
+            request = (self.requests[self.ROBOT_CENTRIC].with_velocity_x(self.vx).with_velocity_y(self.vy)
+                       .with_rotational_rate(self.omega))
+        self.drivetrain.set_control(request)
@@ -0,0 +1,25 @@
+_drivetrain = None
+
+
+def check_no_drivetrain():
+    """
+    Raise if the robot's one CommandSwerveDrivetrain already exists. A second one would
+    build four more modules' devices, start another odometry thread and double the CAN
+    traffic, so it has to be refused before any of that happens.
+    """
+    if _drivetrain is not None:
+        raise RuntimeError("A drivetrain already exists; use get_drivetrain() instead of creating another")
+
+
+def register_drivetrain(drivetrain):
+    """Record the robot's one CommandSwerveDrivetrain"""
+    global _drivetrain
+    check_no_drivetrain()
+    _drivetrain = drivetrain
+
+
+def get_drivetrain():
+    """The drivetrain RobotContainer created"""
+    if _drivetrain is None:
+        raise RuntimeError("No drivetrain has been created yet (RobotContainer creates it)")
+    return _drivetrain
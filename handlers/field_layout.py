@@ -0,0 +1,13 @@
+from robotpy_apriltag import AprilTagField, AprilTagFieldLayout
+
+from autonomous.auton_constants import FIELD_LAYOUT
+
+_field_layout = None
+
+
+def get_field_layout():
+    """The FIELD_LAYOUT AprilTag layout, loaded on first use"""
+    global _field_layout
+    if _field_layout is None:
+        _field_layout = AprilTagFieldLayout.loadField(getattr(AprilTagField, FIELD_LAYOUT))
+    return _field_layout
@@ -1,31 +1,502 @@
+import json
 import math
+import threading
+import time
+from collections import deque
+from typing import NamedTuple
 import limelight
 import limelightresults
+from ntcore import NetworkTableInstance
+from wpilib import Timer
+
+from autonomous.auton_constants import LL_DATA_SETTINGS, LL_SETTINGS
+from handlers.circuit_breaker import CircuitBreaker
+from handlers.limelight_nt import LimelightNTSource, NTFiducialResult
+from handlers.limelight_rest import LimelightRest
+from handlers.multi_tag import MultiTagEstimator
+from handlers.signal_filter import TargetFilter
+from handlers.vision_log import VisionRecorder, VisionReplaySource
+
+
+class MappedData(NamedTuple):
+    """
+    Target values with the LL_DATA_SETTINGS multipliers applied. With LL_SETTINGS["filter"]
+    on they are filtered, with rates per second and a 0..1 confidence.
+    """
+    id: int
+    yaw: float
+    tx: float
+    distance: float
+    yaw_rate: float = 0.0
+    tx_rate: float = 0.0
+    distance_rate: float = 0.0
+    confidence: float = 1.0
+
+
+class TargetData(NamedTuple):
+    tag_id: int
+    tx: float
+    ty: float
+    area: float
+    pitch: float
+    yaw: float
+    roll: float
+    x_pos: float
+    y_pos: float
+    z_pos: float
+    distance: float
+    robot_pose: list | None
+    mapped: MappedData
+
+
+def _ll_multiplier(v_type):
+    return LL_DATA_SETTINGS[v_type].get("multiplier", 1)
+
+
+class FastResult:
+    """
+    Fast-path parse of a Limelight JSON frame: only the fiducial fields we use, as flat
+    per-field lists that reference the JSON data instead of copying it. full() runs the
+    complete limelightresults parser on the same frame when anything else is needed.
+    """
+    __slots__ = ("raw", "validity", "timestamp", "capture_latency", "targeting_latency", "pipeline_id",
+                 "botpose_wpiblue", "botpose_orb_wpiblue", "ids", "tx", "ty", "ta", "target_pose_cs", "robot_pose_ts",
+                 "arrival_time", "pipeline_latency", "capture_time", "_fiducials", "_full")
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.validity = raw.get("v", 0)
+        self.timestamp = raw.get("ts", 0)
+        self.capture_latency = raw.get("cl", 0)
+        self.targeting_latency = raw.get("tl", 0)
+        self.pipeline_id = raw.get("pID", 0)
+        self.botpose_wpiblue = raw.get("botpose_wpiblue", [])
+        self.botpose_orb_wpiblue = raw.get("botpose_orb_wpiblue", [])
+
+        fiducials = raw.get("Fiducial", ())
+        self.ids = [f["fID"] for f in fiducials]
+        self.tx = [f["tx"] for f in fiducials]
+        self.ty = [f["ty"] for f in fiducials]
+        self.ta = [f["ta"] for f in fiducials]
+        self.target_pose_cs = [f["t6t_cs"] for f in fiducials]
+        self.robot_pose_ts = [f["t6r_ts"] for f in fiducials]
+
+        self._fiducials = None
+        self._full = None
+
+    def iter_fiducials(self):
+        return zip(self.ids, self.tx, self.ty, self.ta, self.target_pose_cs, self.robot_pose_ts)
+
+    @property
+    def fiducialResults(self):
+        """Per-tag objects for callers that expect limelightresults field names, built on first use"""
+        if self._fiducials is None:
+            self._fiducials = [
+                NTFiducialResult(tag_id, tx, ty, ta, pose_cs, pose_ts, None)
+                for tag_id, tx, ty, ta, pose_cs, pose_ts in self.iter_fiducials()
+            ]
+        return self._fiducials
+
+    def full(self):
+        if self._full is None:
+            self._full = limelightresults.parse_results(self.raw)
+        return self._full
+
+
+def parse_fast(raw):
+    return FastResult(raw) if raw is not None else None
+
+
+def _iter_fiducials(parsed_result):
+    """(id, tx, ty, ta, target_pose_camera_space, robot_pose_target_space) for each tag in a parsed frame"""
+    if isinstance(parsed_result, FastResult):
+        return parsed_result.iter_fiducials()
+    return (
+        (f.fiducial_id, f.target_x_degrees, f.target_y_degrees, f.target_area,
+         f.target_pose_camera_space, getattr(f, "robot_pose_target_space", None))
+        for f in parsed_result.fiducialResults
+    )
+
+
+def tag_stats(parsed_result):
+    """
+    (tag count, average camera-to-tag distance, average pose ambiguity) for a parsed frame.
+    Ambiguity is None when the transport does not report it (only NT does).
+    """
+    if isinstance(parsed_result, FastResult):
+        poses = parsed_result.target_pose_cs
+        ambiguities = ()
+    else:
+        fiducials = parsed_result.fiducialResults
+        poses = [f.target_pose_camera_space for f in fiducials]
+        ambiguities = [a for a in (getattr(f, "ambiguity", None) for f in fiducials) if a is not None]
+
+    count = len(poses)
+    if count == 0:
+        return 0, 0.0, None
+    distance = sum(math.sqrt(p[0] ** 2 + p[1] ** 2 + p[2] ** 2) for p in poses) / count
+    ambiguity = sum(ambiguities) / len(ambiguities) if ambiguities else None
+    return count, distance, ambiguity
 
-from autonomous.auton_constants import LL_DATA_SETTINGS
 
 class LimelightHandler:
-    def __init__(self, debug=True):
-        self.discovered_limelights = limelight.discover_limelights(debug=debug)
+    def __init__(self, debug=True, background=None, transport=None, parser=None, replay=None):
+        self.discovered_limelights = []
         self.limelight_instance = None
+        self.limelight_rest = None
+        self.nt_source = None
+
+        # "rest" talks to the camera through the limelight JSON client, "nt" reads its NT entries,
+        # "replay" plays back a recorded vision log (a VisionReplaySource can be passed in as replay)
+        self.transport = LL_SETTINGS["transport"] if transport is None else transport
+
+        # Background ingest: a worker thread parses frames into a double buffer.
+        # The worker only ever writes the back slot and then flips the front index,
+        # so readers just grab a reference and never take a lock.
+        self.background = LL_SETTINGS["background_ingest"] if background is None else background
+        self._frames = [None, None]
+        self._front = 0
+        self._ingest_thread = None
+        self._ingest_running = False
+
+        # Connection state machine: "searching" -> "connected" -> "lost" -> "connected" ...
+        self.state = "searching"
+        self._discovery_thread = None
+        self._discovery_stop = threading.Event()
+        self._last_raw = None
+        self._last_raw_time = 0
+
+        # Per-frame memoization: the parsed frame is keyed on the result timestamp, and
+        # get_target_data() answers come from a tag index rebuilt only when the frame changes
+        self._cached_raw = None
+        self._cached_key = None
+        self._cached_result = None
+        self._index_frame = None
+        self._index = {}
+        self._closest = None
+        self._combined = {}
+
+        # Multi-tag mode: the requested tag's pose is blended from every visible tag
+        const = LL_SETTINGS["multi_tag"]
+        self.multi_tag = MultiTagEstimator(const["max_tag_separation"]) if const["enabled"] else None
+
+        # Optional alpha-beta filtering of the mapped values, one TargetFilter per tag id
+        self._filters = {}
+        self._filtered = {}
+
+        # "full" runs limelightresults.parse_results, "fast" only pulls out the fiducial fields
+        self.parser = LL_SETTINGS["parser"] if parser is None else parser
+        self._parse = parse_fast if self.parser == "fast" else limelightresults.parse_results
 
-        if self.discovered_limelights:
-            print(f"##### Limelight init: Limelight found and active:", self.discovered_limelights)
-            limelight_address = self.discovered_limelights[0]
-            self.limelight_instance = limelight.Limelight(limelight_address)
-            self.limelight_instance.pipeline_switch(0)  # Switch to AprilTag detection pipeline
-            self.limelight_instance.enable_websocket()
+        self._multipliers = (_ll_multiplier("yaw"), _ll_multiplier("tx"), _ll_multiplier("distance"))
+        self.cache_stats = {
+            "frame_hits": 0,
+            "frame_misses": 0,
+            "target_hits": 0,
+            "target_misses": 0
+        }
+
+        # Frame timing: every frame gets arrival/capture times in FPGA seconds, frames older
+        # than LL_SETTINGS["max_frame_age"] are dropped by read_results()
+        self._newest_frame = None
+        self._last_stale = None
+        self._frame_arrivals = deque(maxlen=128)
+        # Frames and seconds per pipeline id, counted as frames arrive: at the camera's rate while
+        # the ingest thread is running, capped at the loop rate otherwise
+        self.pipeline_frame_stats = {}
+        self._last_arrival = None
+        self._last_arrival_pipeline = None
+        self.frame_stats = {
+            "fps": 0,
+            "frame_age": 0,
+            "stale_dropped": 0
+        }
+
+        vision_table = NetworkTableInstance.getDefault().getTable("Vision")
+        self._frame_age_pub = vision_table.getDoubleTopic("FrameAge").publish()
+        self._pipeline_latency_pub = vision_table.getDoubleTopic("PipelineLatency").publish()
+        self._fps_pub = vision_table.getDoubleTopic("FPS").publish()
+        self._stale_pub = vision_table.getIntegerTopic("StaleFrames").publish()
+        self._rest_failures_pub = vision_table.getIntegerTopic("RestFailures").publish()
+        self._rest_breaker_open_pub = vision_table.getBooleanTopic("RestBreakerOpen").publish()
+
+        # REST requests to the camera go through a circuit breaker (see LL_SETTINGS["rest"])
+        self.rest_breaker = None
+
+        # Tag ids the camera is currently told to detect; () means no filter
+        self._fiducial_filter = ()
+
+        # MegaTag2 orientation feed: the frame the last orientation write went out for. The camera
+        # reads robot_orientation_set from NT whatever the transport, so it never goes over REST.
+        self._orientation_frame = None
+        self.orientation_writes = 0
+        self._orientation_pub = None
+        if self.transport == "rest":
+            self._orientation_pub = (NetworkTableInstance.getDefault().getTable(LL_SETTINGS["nt_table"])
+                                     .getDoubleArrayTopic("robot_orientation_set").publish())
+
+        self.recorder = None
+        const = LL_SETTINGS["record"]
+        if const["enabled"] and self.transport != "replay":
+            self.recorder = VisionRecorder(const["path"], const["max_bytes"])
+            print(f"##### Limelight recording frames to:", const["path"])
+
+        if self.transport == "replay":
+            # Replayed frames come in through the same source interface as the NT entries
+            const = LL_SETTINGS["replay"]
+            self.nt_source = replay if replay is not None else VisionReplaySource(const["path"], const["speed"])
+            self.state = "connected"
+            return
+
+        if self.transport == "nt":
+            print(f"##### Limelight init: using NetworkTables table:", LL_SETTINGS["nt_table"])
+            self.nt_source = LimelightNTSource(LL_SETTINGS["nt_table"])
+            self.nt_source.pipeline_switch(0)  # Switch to AprilTag detection pipeline
+            self.state = "connected"
+            if self.background:
+                self.start_ingest()
+            return
+
+        const = LL_SETTINGS["rest"]
+        self.rest_breaker = CircuitBreaker(
+            "LimelightREST", self._probe_camera, const["call_timeout"], const["max_failures"],
+            const["probe_period"], const["probe_timeout"])
+
+        # Discovery runs on its own thread so robotInit never waits on the network scan.
+        # read_results() reports no data until the camera attaches.
+        self.debug = debug
+        self._discovery_thread = threading.Thread(target=self._discovery_loop, name="LimelightDiscovery", daemon=True)
+        self._discovery_thread.start()
+
+        if self.background:
+            self.start_ingest()
+
+    def _discovery_loop(self):
+        const = LL_SETTINGS["discovery"]
+        backoff = const["backoff_initial"]
+
+        while not self._discovery_stop.is_set():
+            if self.state == "connected":
+                try:
+                    lost = self._connection_lost()
+                except Exception as e:
+                    print(f"##### Limelight discovery: ERROR: {e}")
+                    lost = True
+                if lost:
+                    print(f"##### Limelight discovery: connection LOST, searching again")
+                    self._detach()
+                    self.state = "lost"
+                    backoff = const["backoff_initial"]
+                self._discovery_stop.wait(const["monitor_period"])
+                continue
+
+            try:
+                self.discovered_limelights = limelight.discover_limelights(
+                    timeout=const["scan_timeout"], debug=self.debug)
+            except Exception as e:
+                print(f"##### Limelight discovery: ERROR: {e}")
+                self.discovered_limelights = []
+
+            if self.discovered_limelights:
+                print(f"##### Limelight init: Limelight found and active:", self.discovered_limelights)
+                self._attach(self.discovered_limelights[0])
+                backoff = const["backoff_initial"]
+            else:
+                print(f"##### Limelight init: ERROR: No Limelights found, retrying in {backoff:.1f}s")
+                self._discovery_stop.wait(backoff)
+                backoff = min(backoff * 2, const["backoff_max"])
+
+    def _attach(self, limelight_address):
+        instance = limelight.Limelight(limelight_address)
+        rest = LimelightRest(limelight_address, LL_SETTINGS["rest"]["http_timeout"])
+        try:
+            rest.pipeline_switch(0)  # Switch to AprilTag detection pipeline
+            instance.enable_websocket()
+        except Exception as e:
+            print(f"##### Limelight init: ERROR: could not attach to {limelight_address}: {e}")
+            return
+
+        self._last_raw = None
+        self._last_raw_time = time.monotonic()
+        self._fiducial_filter = ()  # A freshly attached camera runs the pipeline's own settings
+        self.limelight_rest = rest
+        self.limelight_instance = instance
+        self.state = "connected"
+
+    def _probe_camera(self):
+        rest = self.limelight_rest
+        return rest is not None and rest.get_status() is not None
+
+    def rest_submit(self, method_name, *args):
+        """Send a Limelight REST request without waiting for it; False when it could not be sent"""
+        rest = self.limelight_rest
+        if rest is None:
+            return False
+        return self.rest_breaker.submit(getattr(rest, method_name), *args)
+
+    def pipeline_switch(self, index):
+        if self.nt_source:
+            self.nt_source.pipeline_switch(index)
+            sent = True
+        else:
+            sent = self.rest_submit("pipeline_switch", index)
+        if sent and self._fiducial_filter:
+            # The new pipeline runs its own saved filter, not ours: unknown until it is sent again.
+            # With no filter of ours active the saved one is what we wanted anyway.
+            self._fiducial_filter = None
+        return sent
+
+    def set_fiducial_filter(self, tag_ids):
+        """Have the camera only detect and report these tag ids; None or empty clears the filter"""
+        tag_ids = tuple(sorted(tag_ids)) if tag_ids else ()
+        if tag_ids == self._fiducial_filter:
+            return
+
+        if self.nt_source:
+            self.nt_source.set_fiducial_filter(tag_ids)
+            sent = True
+        elif tag_ids:
+            # Not flushed, so the pipeline file on the camera keeps its saved filter
+            update = {LL_SETTINGS["fiducial_filter"]["pipeline_key"]: ",".join(str(tag_id) for tag_id in tag_ids)}
+            sent = self.rest_submit("update_pipeline", json.dumps(update))
         else:
-            print(f"##### Limelight init: ERROR: No Limelights found")
+            # Back to the saved pipeline (and its saved filter) rather than an empty filter
+            sent = self.rest_submit("reload_pipeline")
+
+        if sent:
+            print(f"##### Limelight fiducial filter: {list(tag_ids) if tag_ids else 'cleared'}")
+            self._fiducial_filter = tag_ids
+
+    def set_robot_orientation(self, yaw, yaw_rate):
+        """
+        Give the camera the robot's field yaw (degrees) and yaw rate (degrees/s) for the
+        MegaTag2 solver. Safe to call every loop: at most one write goes out per camera frame.
+        """
+        frame = self._newest_frame
+        if self.orientation_writes and frame is self._orientation_frame:
+            return False
+
+        orientation = [yaw, yaw_rate, 0, 0, 0, 0]
+        if self.nt_source:
+            self.nt_source.set_robot_orientation(orientation)
+        else:
+            self._orientation_pub.set(orientation)
+
+        self._orientation_frame = frame
+        self.orientation_writes += 1
+        return True
+
+    def _detach(self):
+        instance = self.limelight_instance
+        self.limelight_instance = None
+        self.limelight_rest = None
+        self._frames = [None, None]
+        if instance:
+            try:
+                instance.disable_websocket()
+            except Exception as e:
+                print(f"##### Limelight discovery: ERROR: closing websocket: {e}")
+
+    def _connection_lost(self):
+        """The websocket thread died, or no new frame arrived for too long"""
+        instance = self.limelight_instance
+        if instance is None:
+            return True
+        if instance.ws_thread is not None and not instance.ws_thread.is_alive():
+            return True
+
+        raw = instance.get_latest_results()
+        now = time.monotonic()
+        if raw is not self._last_raw:
+            self._last_raw = raw
+            self._last_raw_time = now
+        return now - self._last_raw_time > LL_SETTINGS["discovery"]["lost_after"]
+
+    def start_ingest(self):
+        """Start the background thread that keeps the newest parsed frame ready"""
+        if self._ingest_thread is not None:
+            return
+        self._ingest_running = True
+        self._ingest_thread = threading.Thread(target=self._ingest_loop, name="LimelightIngest", daemon=True)
+        self._ingest_thread.start()
+        print(f"##### Limelight ingest: background thread started")
+
+    def stop_ingest(self):
+        if self._ingest_thread is None:
+            return
+        self._ingest_running = False
+        self._ingest_thread.join()
+        self._ingest_thread = None
+
+    def _ingest_loop(self):
+        last_raw = None
+        while self._ingest_running:
+            try:
+                parsed_result = None
+                instance = self.limelight_instance
+                if self.nt_source:
+                    parsed_result = self._read_nt()
+                elif instance is not None:
+                    raw = instance.get_latest_results()
+                    # The websocket hands back the same dict until a new frame arrives
+                    if raw is not None and raw is not last_raw:
+                        last_raw = raw
+                        parsed_result = self._parse_raw(raw)
+                        if parsed_result is not None:
+                            self._stamp(parsed_result)
+
+                if parsed_result is not None and parsed_result is not self._frames[self._front]:
+                    back = 1 - self._front
+                    self._frames[back] = parsed_result
+                    self._front = back
+            except Exception as e:
+                print(f"##### Limelight ingest: ERROR: {e}")
+            time.sleep(LL_SETTINGS["ingest_period"])
 
     def read_results(self):
-        """Get the raw limelight results"""
+        """Get the newest limelight results, or None when there is no frame or it is older than max_frame_age"""
+        parsed_result = self._read_latest()
+        if parsed_result is None:
+            return None
+
+        max_age = LL_SETTINGS["max_frame_age"]
+        if max_age is not None and Timer.getFPGATimestamp() - parsed_result.capture_time > max_age:
+            if parsed_result is not self._last_stale:
+                self._last_stale = parsed_result
+                self.frame_stats["stale_dropped"] += 1
+            return None
+        return parsed_result
+
+    def _read_latest(self):
+        if self._ingest_thread is not None:
+            # Newest frame published by the ingest thread, no fetch or parse here
+            return self._frames[self._front]
+
+        if self.nt_source:
+            return self._read_nt()
+
         # print(f"##### Limelight read_results: starting")
-        if self.limelight_instance:
+        instance = self.limelight_instance
+        if instance:
             # print(f"##### Limelight read_results: there is an instance")
-            result = self.limelight_instance.get_latest_results()
+            result = instance.get_latest_results()
             # print("Limelight read_results: result:", result)
-            parsed_result = limelightresults.parse_results(result)
+            if result is None:
+                return None
+
+            frame_key = result.get("ts")
+            if self._cached_result is not None and (
+                    result is self._cached_raw or (frame_key is not None and frame_key == self._cached_key)):
+                self.cache_stats["frame_hits"] += 1
+                return self._cached_result
+
+            self.cache_stats["frame_misses"] += 1
+            parsed_result = self._parse_raw(result)
+            if parsed_result is not None:
+                self._stamp(parsed_result)
+            self._cached_raw = result
+            self._cached_key = frame_key
+            self._cached_result = parsed_result
 
 
             if parsed_result is not None:
@@ -40,108 +511,268 @@ class LimelightHandler:
                 return parsed_result
         return None
 
-    def get_target_data(self, target_tag_id=None):
+    def _parse_raw(self, raw):
+        parsed_result = self._parse(raw)
+        if parsed_result is not None and not isinstance(parsed_result, FastResult):
+            # limelightresults doesn't know the MegaTag2 pose
+            parsed_result.botpose_orb_wpiblue = raw.get("botpose_orb_wpiblue", [])
+        return parsed_result
+
+    def _read_nt(self):
+        parsed_result = self.nt_source.read_results()
+        if parsed_result is not None and parsed_result is not self._newest_frame:
+            self._stamp(parsed_result)
+        return parsed_result
+
+    def _stamp(self, parsed_result):
+        """Tag a new frame with arrival time, pipeline latency and capture time, all in FPGA seconds"""
+        arrival = getattr(parsed_result, "arrival_time", None)
+        if arrival is None:
+            # REST frames are stamped when we first see them
+            arrival = Timer.getFPGATimestamp()
+        pipeline_latency = (parsed_result.targeting_latency + parsed_result.capture_latency) / 1000.0
+
+        parsed_result.arrival_time = arrival
+        parsed_result.pipeline_latency = pipeline_latency
+        parsed_result.capture_time = arrival - pipeline_latency
+
+        self._newest_frame = parsed_result
+        self._frame_arrivals.append(arrival)
+
+        pipeline = parsed_result.pipeline_id
+        if pipeline == self._last_arrival_pipeline and arrival > self._last_arrival:
+            stats = self.pipeline_frame_stats.setdefault(pipeline, {"frames": 0, "seconds": 0.0})
+            stats["frames"] += 1
+            stats["seconds"] += arrival - self._last_arrival
+        self._last_arrival = arrival
+        self._last_arrival_pipeline = pipeline
+
+        if self.recorder is not None:
+            try:
+                self._record(parsed_result)
+            except Exception as e:
+                print(f"##### Limelight recorder: ERROR: {e}, recording stopped")
+                self.recorder.close()
+                self.recorder = None
+
+    def _record(self, parsed_result):
+        if isinstance(parsed_result, FastResult):
+            fiducials = [
+                (tag_id, tx, ty, ta, None, pose_cs, pose_ts)
+                for tag_id, tx, ty, ta, pose_cs, pose_ts in parsed_result.iter_fiducials()
+            ]
+        else:
+            fiducials = [
+                (f.fiducial_id, f.target_x_degrees, f.target_y_degrees, f.target_area,
+                 getattr(f, "ambiguity", None), f.target_pose_camera_space,
+                 getattr(f, "robot_pose_target_space", None))
+                for f in parsed_result.fiducialResults
+            ]
+        self.recorder.write(parsed_result, fiducials)
+
+    def publish_stats(self):
+        """Frame age, latency and FPS of the newest frame to NT, once per loop"""
+        now = Timer.getFPGATimestamp()
+        newest = self._newest_frame
+
+        self.frame_stats["fps"] = sum(1 for t in tuple(self._frame_arrivals) if now - t <= 1.0)
+        if newest is not None:
+            self.frame_stats["frame_age"] = now - newest.capture_time
+            self._pipeline_latency_pub.set(newest.pipeline_latency * 1000.0)
+            self._frame_age_pub.set(self.frame_stats["frame_age"] * 1000.0)
 
+        self._fps_pub.set(self.frame_stats["fps"])
+        self._stale_pub.set(self.frame_stats["stale_dropped"])
+        if self.rest_breaker is not None:
+            self._rest_failures_pub.set(self.rest_breaker.total_failures)
+            self._rest_breaker_open_pub.set(self.rest_breaker.is_open())
+
+    def read_full_results(self):
+        """The current frame through the full limelightresults parser, whatever the parser mode"""
         parsed_result = self.read_results()
+        if isinstance(parsed_result, FastResult):
+            return parsed_result.full()
+        return parsed_result
 
-        if not (parsed_result and parsed_result.validity and len(parsed_result.fiducialResults) > 0):
-            # print("##### Limelight get_target_data: No valid targets found")
-            return None
+    def get_target_data(self, target_tag_id=None, set_priority=True):
+        """
+        TargetData for the requested tag, or for the closest tag when no id is given
+        or the requested one is not in view. None when there are no valid targets.
+        set_priority=False leaves the NT priority id alone, for readers that only look.
+        """
 
-        # print(f"##### Limelight get_target_data: Found {len(parsed_result.fiducialResults)} valid targets")
-
-        selected_fiducial = None
-
-        # If a specific tag ID is requested
-        if target_tag_id is not None:
-            # print(f"##### Limelight get_target_data: Looking for tag ID {target_tag_id}")
-            # Look for the requested tag ID in the results
-            for fiducial in parsed_result.fiducialResults:
-                if fiducial.fiducial_id == target_tag_id:
-                    selected_fiducial = fiducial
-                    # print(f"##### Limelight get_target_data: Found requested tag ID: {target_tag_id}")
-                    break
-
-        # If no specific tag was requested or the requested tag wasn't found
-        if selected_fiducial is None:
-            # Find the closest tag
-            closest_distance = float('inf')
-            for fiducial in parsed_result.fiducialResults:
-                selected_fiducial = fiducial
-                # Calculate distance to this tag
-                tx_pos = fiducial.target_pose_camera_space[0]
-                ty_pos = fiducial.target_pose_camera_space[1]
-                tz_pos = fiducial.target_pose_camera_space[2]
-                distance = math.sqrt(tx_pos ** 2 + ty_pos ** 2 + tz_pos ** 2)
-
-                if distance < closest_distance:
-                    closest_distance = distance
-                    selected_fiducial = fiducial
-
-            # if selected_fiducial:
-            #     print(
-                    # f"##### Limelight get_target_data: Using closest tag (ID: {selected_fiducial.fiducial_id}, distance: {closest_distance:.2f}m)")
-
-        # If we still don't have a selected fiducial (shouldn't happen if we had valid results)
-        if selected_fiducial is None:
-            # print("##### Limelight get_target_data: No valid fiducial found")
-            return None
+        if self.nt_source and set_priority:
+            # Only the primary target has full pose data over NT
+            self.nt_source.set_priority_id(target_tag_id)
 
-        # print("-----")
-        # for attr_name in dir(selected_fiducial):
-        #     if not attr_name.startswith("_"):
-        #         print(f" - {attr_name}")
+        parsed_result = self.read_results()
 
-        # print(f"raw pose: {selected_fiducial.target_pose_camera_space}")
+        # The tag index is built once per frame; every other call is a dict lookup
+        if parsed_result is not self._index_frame:
+            self.cache_stats["target_misses"] += 1
+            self._index_frame = parsed_result
+            self._index, self._closest = self._build_index(parsed_result)
+            self._combined = {}
+            self._filtered = {}
+        else:
+            self.cache_stats["target_hits"] += 1
 
-        # Process the selected fiducial into a clean data object
-        tx_pos = selected_fiducial.target_pose_camera_space[0]
-        ty_pos = selected_fiducial.target_pose_camera_space[1]
-        tz_pos = selected_fiducial.target_pose_camera_space[2]
-        distance = math.sqrt(tx_pos ** 2 + ty_pos ** 2 + tz_pos ** 2)
+        target_data = None
+        if self.multi_tag is not None:
+            target_data = self._combined_target(target_tag_id)
+        if target_data is None and target_tag_id is not None:
+            target_data = self._index.get(target_tag_id)
+        if target_data is None:
+            target_data = self._closest
+
+        if target_data is not None and LL_SETTINGS["filter"]["enabled"]:
+            target_data = self._filter_target(target_data, parsed_result.capture_time)
+        return target_data
+
+    def _filter_target(self, target_data, capture_time):
+        """Run the tag's filters once per frame and swap in the filtered mapped values"""
+        tag_id = target_data.tag_id
+        if tag_id not in self._filtered:
+            const = LL_SETTINGS["filter"]
+            target_filter = self._filters.get(tag_id)
+            if target_filter is None:
+                target_filter = self._filters[tag_id] = TargetFilter(const["alpha"], const["beta"])
+            target_filter.update(target_data.mapped, capture_time, const["reset_after"])
+
+            f = target_filter.filters
+            # An unknown (NaN) yaw stays unknown rather than coasting on the filter
+            yaw = target_data.mapped.yaw if math.isnan(target_data.mapped.yaw) else f["yaw"].value
+            self._filtered[tag_id] = target_data._replace(mapped=target_data.mapped._replace(
+                yaw=yaw, tx=f["tx"].value, distance=f["distance"].value,
+                yaw_rate=f["yaw"].rate, tx_rate=f["tx"].rate, distance_rate=f["distance"].rate,
+                confidence=target_filter.confidence(const["noise"], const["settle_frames"])
+            ))
+        return self._filtered[tag_id]
+
+    def _combined_target(self, target_tag_id):
+        """Multi-tag TargetData for the requested (or closest) tag, once per frame"""
+        if target_tag_id is None:
+            if self._closest is None:
+                return None
+            target_tag_id = self._closest.tag_id
+
+        if target_tag_id not in self._combined:
+            estimate = self.multi_tag.estimate(target_tag_id, self._index.values())
+            if estimate is None:
+                self._combined[target_tag_id] = None
+            else:
+                tx, ty, area, pose = estimate
+                own = self._index.get(target_tag_id)
+                self._combined[target_tag_id] = self._target_data(
+                    target_tag_id, tx, ty, area, pose, own.robot_pose if own is not None else None)
+        return self._combined[target_tag_id]
 
+    def project_target(self, target, moved):
+        """
+        The target as the camera would see it now, after the robot moved by `moved`
+        (the robot pose now relative to the robot pose at capture, a Pose2d). Only the
+        horizontal plane changes: position, yaw and tx. Camera x is right and z forward;
+        yaw turns about the camera's down axis, so it is the negative of a robot-frame angle.
+        """
+        cam_x, cam_y = LL_SETTINGS["latency_compensation"]["camera_offset"]
+
+        # Tag position and facing in the robot frame at capture
+        px = cam_x + target.z_pos
+        py = cam_y - target.x_pos
+        heading = -math.radians(target.yaw)
+
+        # ...and in the robot frame now
+        dx = px - moved.x
+        dy = py - moved.y
+        turn = moved.rotation().radians()
+        cos_t = math.cos(-turn)
+        sin_t = math.sin(-turn)
+        nx = dx * cos_t - dy * sin_t - cam_x
+        ny = dx * sin_t + dy * cos_t - cam_y
+
+        pose = [-ny, target.y_pos, nx, target.pitch, -math.degrees(heading - turn), target.roll]
+        shift = math.degrees(math.atan2(pose[0], pose[2]) - math.atan2(target.x_pos, target.z_pos))
+        distance = math.sqrt(pose[0] ** 2 + pose[1] ** 2 + pose[2] ** 2)
+
+        # Move the (possibly filtered) mapped values by the same change, keeping rates and confidence
+        m_yaw, m_tx, m_distance = self._multipliers
+        mapped = target.mapped._replace(
+            yaw=target.mapped.yaw + (pose[4] - target.yaw) * m_yaw,
+            tx=target.mapped.tx + shift * m_tx,
+            distance=target.mapped.distance + (distance - target.distance) * m_distance
+        )
+        return target._replace(
+            tx=target.tx + shift, yaw=pose[4], x_pos=pose[0], z_pos=pose[2], distance=distance, mapped=mapped)
+
+    def _target_data(self, tag_id, tx, ty, ta, pose, robot_pose):
         # Pitch (up/down tilt)
         # Yaw (left/right rotation)
         # Roll (twist) of the tag
+        tx_pos = pose[0]
+        ty_pos = pose[1]
+        tz_pos = pose[2]
+        distance = math.sqrt(tx_pos ** 2 + ty_pos ** 2 + tz_pos ** 2)
+        m_yaw, m_tx, m_distance = self._multipliers
 
-        target_data = {
-            'tag_id': selected_fiducial.fiducial_id,
-            'tx': selected_fiducial.target_x_degrees,
-            'ty': selected_fiducial.target_y_degrees,
-            'area': selected_fiducial.target_area,
-            'pitch': selected_fiducial.target_pose_camera_space[3],
-            'yaw': selected_fiducial.target_pose_camera_space[4],
-            'roll': selected_fiducial.target_pose_camera_space[5],
-            'x_pos': tx_pos,
-            'y_pos': ty_pos,
-            'z_pos': tz_pos,
-            'distance': distance,
-            'robot_pose': selected_fiducial.robot_pose_target_space if hasattr(selected_fiducial,
-                                                                               'robot_pose_target_space') else None
-        }
+        return TargetData(
+            tag_id=tag_id,
+            tx=tx,
+            ty=ty,
+            area=ta,
+            pitch=pose[3],
+            yaw=pose[4],
+            roll=pose[5],
+            x_pos=tx_pos,
+            y_pos=ty_pos,
+            z_pos=tz_pos,
+            distance=distance,
+            robot_pose=robot_pose,
+            mapped=MappedData(
+                id=tag_id,
+                yaw=pose[4] * m_yaw,
+                tx=tx * m_tx,
+                distance=distance * m_distance
+            )
+        )
 
-        target_data['mapped'] = self.map_ll_data(target_data)
+    def _build_index(self, parsed_result):
+        """Map tag id -> TargetData for one frame, and pick out the closest tag"""
 
-        return target_data
+        if not (parsed_result and parsed_result.validity):
+            # print("##### Limelight get_target_data: No valid targets found")
+            return {}, None
 
-        # return None
+        index = {}
+        closest = None
 
-    def map_ll_data(self, result):
+        for tag_id, tx, ty, ta, pose, robot_pose in _iter_fiducials(parsed_result):
+            if tag_id in index:
+                continue
 
-        def do_multiplier(v_type, v_input):
-            const = LL_DATA_SETTINGS[v_type]
-            if "multiplier" in const:
-                return v_input * const["multiplier"]
-            else:
-                return v_input
+            target_data = self._target_data(tag_id, tx, ty, ta, pose, robot_pose)
+            index[target_data.tag_id] = target_data
 
-        return {
-            "id": result["tag_id"],
-            "yaw": do_multiplier("yaw", result["yaw"]),
-            "tx": do_multiplier("tx", result["tx"]),
-            "distance": do_multiplier("distance", result["distance"])
-        }
+            if closest is None or target_data.distance < closest.distance:
+                closest = target_data
+
+        return index, closest
+
+    def get_cache_stats(self):
+        """Frame/target cache hit and miss counts, plus hit ratios"""
+        stats = dict(self.cache_stats)
+        for kind in ("frame", "target"):
+            total = stats[f"{kind}_hits"] + stats[f"{kind}_misses"]
+            stats[f"{kind}_hit_ratio"] = stats[f"{kind}_hits"] / total if total else 0
+        return stats
+
+    def is_connected(self):
+        return self.state == "connected"
 
     def cleanup(self):
-        if self.limelight_instance:
-            self.limelight_instance.disable_websocket()
\ No newline at end of file
+        self.stop_ingest()
+        if self.recorder is not None:
+            self.recorder.close()
+        if self._discovery_thread is not None:
+            self._discovery_stop.set()
+            self._discovery_thread.join()
+            self._detach()
\ No newline at end of file
@@ -0,0 +1,155 @@
+import math
+from ntcore import NetworkTableInstance
+
+
+# rawfiducials holds 7 values per tag: id, txnc, tync, ta, distToCamera, distToRobot, ambiguity
+RAW_FIDUCIAL_STRIDE = 7
+
+# The primary tag's pose entries only belong to a rawfiducials frame when they were
+# published with it (NT timestamps in microseconds)
+SAME_FRAME_US = 1000
+
+
+class NTFiducialResult:
+    """Same field names as limelightresults.FiducialResult, for the fields we use"""
+    __slots__ = ("fiducial_id", "target_x_degrees", "target_y_degrees", "target_area",
+                 "target_pose_camera_space", "robot_pose_target_space", "ambiguity")
+
+    def __init__(self, fiducial_id, tx, ty, ta, target_pose_camera_space, robot_pose_target_space, ambiguity):
+        self.fiducial_id = fiducial_id
+        self.target_x_degrees = tx
+        self.target_y_degrees = ty
+        self.target_area = ta
+        self.target_pose_camera_space = target_pose_camera_space
+        self.robot_pose_target_space = robot_pose_target_space
+        self.ambiguity = ambiguity
+
+
+class NTGeneralResult:
+    """Same field names as limelightresults.GeneralResult, for the fields we use"""
+    __slots__ = ("validity", "fiducialResults", "timestamp", "capture_latency", "targeting_latency",
+                 "pipeline_id", "botpose_wpiblue", "botpose_orb_wpiblue", "arrival_time", "pipeline_latency",
+                 "capture_time")
+
+    def __init__(self, validity, fiducial_results, timestamp, capture_latency, targeting_latency,
+                 pipeline_id, botpose_wpiblue, arrival_time, botpose_orb_wpiblue=None):
+        self.validity = validity
+        self.fiducialResults = fiducial_results
+        self.timestamp = timestamp
+        self.capture_latency = capture_latency
+        self.targeting_latency = targeting_latency
+        self.pipeline_id = pipeline_id
+        self.botpose_wpiblue = botpose_wpiblue
+        self.botpose_orb_wpiblue = botpose_orb_wpiblue if botpose_orb_wpiblue is not None else []
+        self.arrival_time = arrival_time
+        self.pipeline_latency = None
+        self.capture_time = None
+
+
+class LimelightNTSource:
+    """
+    Reads Limelight results from the camera's NetworkTables entries instead of the
+    REST/websocket JSON. Only the primary target (tid) carries the full 6-DoF poses,
+    so set_priority_id() is used to make the requested tag the primary one.
+    """
+
+    def __init__(self, table_name="limelight"):
+        table = NetworkTableInstance.getDefault().getTable(table_name)
+
+        self._raw_fiducials = table.getDoubleArrayTopic("rawfiducials").subscribe([])
+        self._target_pose_cs = table.getDoubleArrayTopic("targetpose_cameraspace").subscribe([])
+        self._bot_pose_ts = table.getDoubleArrayTopic("botpose_targetspace").subscribe([])
+        self._botpose_wpiblue = table.getDoubleArrayTopic("botpose_wpiblue").subscribe([])
+        self._botpose_orb_wpiblue = table.getDoubleArrayTopic("botpose_orb_wpiblue").subscribe([])
+        self._tv = table.getDoubleTopic("tv").subscribe(0)
+        self._tid = table.getDoubleTopic("tid").subscribe(-1)
+        self._tl = table.getDoubleTopic("tl").subscribe(0)
+        self._cl = table.getDoubleTopic("cl").subscribe(0)
+        self._getpipe = table.getDoubleTopic("getpipe").subscribe(0)
+
+        self._pipeline_pub = table.getDoubleTopic("pipeline").publish()
+        self._priority_pub = table.getDoubleTopic("priorityid").publish()
+        self._id_filter_pub = table.getDoubleArrayTopic("fiducial_id_filters_set").publish()
+        self._orientation_pub = table.getDoubleArrayTopic("robot_orientation_set").publish()
+        self._priority_id = None
+
+        self._last_time = None
+        self._last_result = None
+
+    def pipeline_switch(self, index):
+        self._pipeline_pub.set(index)
+
+    def set_priority_id(self, tag_id):
+        """Ask the camera to make tag_id the primary target (-1 clears it)"""
+        tag_id = -1 if tag_id is None else tag_id
+        if tag_id != self._priority_id:
+            self._priority_id = tag_id
+            self._priority_pub.set(tag_id)
+
+    def set_fiducial_filter(self, tag_ids):
+        """Only detect these tag ids on the camera; an empty list clears the override"""
+        self._id_filter_pub.set([float(tag_id) for tag_id in tag_ids])
+
+    def set_robot_orientation(self, orientation):
+        """[yaw, yaw rate, pitch, pitch rate, roll, roll rate] in degrees for the MegaTag2 solver"""
+        self._orientation_pub.set(orientation)
+        NetworkTableInstance.getDefault().flush()  # Don't wait for the periodic NT update
+
+    def read_results(self):
+        """Build a parsed-result object from the latest NT values; same object until a new frame lands"""
+        raw = self._raw_fiducials.getAtomic()
+        if raw.time == 0:
+            return None
+        if raw.time == self._last_time:
+            return self._last_result
+
+        # A primary pose from another frame (e.g. just after priorityid changed) is not used.
+        # Only the pose timestamps are checked: NT drops unchanged values, so tid keeps the time
+        # it last changed while the same tag stays primary.
+        primary_id = None
+        pose_cs = self._target_pose_cs.getAtomic()
+        pose_ts = self._bot_pose_ts.getAtomic()
+        if all(abs(entry.time - raw.time) <= SAME_FRAME_US for entry in (pose_cs, pose_ts)):
+            primary_id = int(self._tid.get())
+        primary_pose_cs = pose_cs.value
+        primary_pose_ts = pose_ts.value
+
+        values = raw.value
+        fiducials = []
+        for i in range(0, len(values) - RAW_FIDUCIAL_STRIDE + 1, RAW_FIDUCIAL_STRIDE):
+            tag_id = int(values[i])
+            tx = values[i + 1]
+            ty = values[i + 2]
+            ta = values[i + 3]
+            dist = values[i + 4]
+
+            if tag_id == primary_id and len(primary_pose_cs) >= 6:
+                pose_cs = list(primary_pose_cs)
+                pose_ts = list(primary_pose_ts)
+            else:
+                # Non-primary tags only give angles and range; rebuild the position, orientation unknown (NaN)
+                tx_rad = math.radians(tx)
+                ty_rad = math.radians(ty)
+                pose_cs = [
+                    dist * math.cos(ty_rad) * math.sin(tx_rad),
+                    -dist * math.sin(ty_rad),
+                    dist * math.cos(ty_rad) * math.cos(tx_rad),
+                    math.nan, math.nan, math.nan
+                ]
+                pose_ts = None
+
+            fiducials.append(NTFiducialResult(tag_id, tx, ty, ta, pose_cs, pose_ts, values[i + 6]))
+
+        self._last_time = raw.time
+        self._last_result = NTGeneralResult(
+            validity=int(self._tv.get()),
+            fiducial_results=fiducials,
+            timestamp=raw.time / 1000.0,  # NT time is microseconds, keep ms like the JSON "ts"
+            capture_latency=self._cl.get(),
+            targeting_latency=self._tl.get(),
+            pipeline_id=int(self._getpipe.get()),
+            botpose_wpiblue=list(self._botpose_wpiblue.get()),
+            botpose_orb_wpiblue=list(self._botpose_orb_wpiblue.get()),
+            arrival_time=raw.time / 1e6,  # NT timestamps share the FPGA time base on the roboRIO
+        )
+        return self._last_result
@@ -0,0 +1,35 @@
+import requests
+
+
+class LimelightRest:
+    """
+    The Limelight REST calls the handler makes, like limelight.Limelight's but with an
+    HTTP timeout (the client library's calls have none, so a hung socket would hold the
+    circuit breaker's only worker forever). Error responses raise, so the breaker counts
+    them as failures.
+    """
+
+    def __init__(self, address, timeout):
+        self.base_url = f"http://{address}:5807"
+        self.timeout = timeout
+
+    def _post(self, path, **kwargs):
+        response = requests.post(f"{self.base_url}/{path}", timeout=self.timeout, **kwargs)
+        response.raise_for_status()
+        return response
+
+    def pipeline_switch(self, index):
+        return self._post("pipeline-switch", params={"index": index})
+
+    def update_pipeline(self, profile_json, flush=None):
+        params = {} if flush is None else {"flush": flush}
+        return self._post("update-pipeline", params=params, data=profile_json,
+                          headers={"Content-Type": "application/json"})
+
+    def reload_pipeline(self):
+        return self._post("reload-pipeline")
+
+    def get_status(self):
+        response = requests.get(f"{self.base_url}/status", timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
@@ -0,0 +1,114 @@
+import math
+
+from wpimath.geometry import Pose3d, Rotation3d, Transform3d, Translation3d
+
+from handlers.field_layout import get_field_layout
+
+
+# The Limelight's tag frame (x right, y down, z into the tag, as seen from the front)
+# relative to the WPILib field layout's tag frame (x out of the tag, z up)
+_LL_TAG_FRAME = Transform3d(Translation3d(), Rotation3d(math.pi / 2, math.pi, -math.pi / 2))
+
+
+def _to_pose3d(x, y, z, pitch, yaw, roll):
+    """Limelight camera-space [x, y, z, pitch, yaw, roll] (degrees) as a Pose3d, like LimelightHelpers.toPose3D"""
+    return Pose3d(Translation3d(x, y, z), Rotation3d(math.radians(pitch), math.radians(yaw), math.radians(roll)))
+
+
+def _weighted_angle(angles, weights):
+    """Weighted mean of angles in degrees, safe across +-180; unknown (NaN) angles are left out"""
+    known = [(a, w) for a, w in zip(angles, weights) if not math.isnan(a)]
+    if not known:
+        return math.nan
+    s = sum(w * math.sin(math.radians(a)) for a, w in known)
+    c = sum(w * math.cos(math.radians(a)) for a, w in known)
+    return math.degrees(math.atan2(s, c))
+
+
+class MultiTagEstimator:
+    """
+    Estimates where one tag is in camera space from every visible tag, using the tag
+    offsets in the field layout, and blends the estimates weighted by area over distance
+    (big, close tags are the least noisy). Only tags with a full 6-DoF camera-space pose
+    and within max_tag_separation of the target take part, so a tag on the far side of
+    the field doesn't lever its rotation error into the estimate.
+    """
+
+    def __init__(self, max_tag_separation):
+        layout = get_field_layout()
+        self.max_tag_separation = max_tag_separation
+        self._tag_poses = {tag.ID: tag.pose.transformBy(_LL_TAG_FRAME) for tag in layout.getTags()}
+        self._offsets = {}
+        self._neighbours = {}
+
+    def neighbours(self, tag_id):
+        """Ids of the tags within max_tag_separation of tag_id (including itself)"""
+        if tag_id not in self._neighbours:
+            if tag_id not in self._tag_poses:
+                self._neighbours[tag_id] = frozenset((tag_id,))
+            else:
+                position = self._tag_poses[tag_id].translation()
+                self._neighbours[tag_id] = frozenset(
+                    other_id for other_id, pose in self._tag_poses.items()
+                    if pose.translation().distance(position) <= self.max_tag_separation
+                )
+        return self._neighbours[tag_id]
+
+    def _offset(self, from_tag_id, to_tag_id):
+        """Transform from one tag to another, in Limelight tag frames; None when too far apart"""
+        key = (from_tag_id, to_tag_id)
+        if key not in self._offsets:
+            from_pose = self._tag_poses[from_tag_id]
+            to_pose = self._tag_poses[to_tag_id]
+            if from_pose.translation().distance(to_pose.translation()) > self.max_tag_separation:
+                self._offsets[key] = None
+            else:
+                self._offsets[key] = Transform3d(from_pose, to_pose)
+        return self._offsets[key]
+
+    def estimate(self, target_tag_id, targets):
+        """
+        (tx, ty, area, [x, y, z, pitch, yaw, roll]) of target_tag_id blended from the
+        visible TargetData, or None when no visible tag can see it. area and tx/ty come
+        from the target itself when it is in view, otherwise they are derived from the pose.
+        """
+        if target_tag_id not in self._tag_poses:
+            return None
+
+        own = None
+        weights, txs, tys, poses = [], [], [], []
+        for target in targets:
+            if target.tag_id == target_tag_id:
+                own = target
+                pose = (target.x_pos, target.y_pos, target.z_pos, target.pitch, target.yaw, target.roll)
+                tx, ty = target.tx, target.ty
+            else:
+                # NT only gives the primary tag's orientation (robot_pose is None for the rest)
+                if target.robot_pose is None or target.tag_id not in self._tag_poses:
+                    continue
+                offset = self._offset(target.tag_id, target_tag_id)
+                if offset is None:
+                    continue
+                seen = _to_pose3d(target.x_pos, target.y_pos, target.z_pos, target.pitch, target.yaw, target.roll)
+                estimated = seen.transformBy(offset)
+                t = estimated.translation()
+                r = estimated.rotation()
+                pose = (t.x, t.y, t.z, math.degrees(r.x), math.degrees(r.y), math.degrees(r.z))
+                tx = math.degrees(math.atan2(t.x, t.z))
+                ty = -math.degrees(math.atan2(t.y, math.hypot(t.x, t.z)))
+
+            weights.append(target.area / max(target.distance, 0.1))
+            txs.append(tx)
+            tys.append(ty)
+            poses.append(pose)
+
+        total = sum(weights)
+        if not poses or total <= 0:
+            return None
+
+        blended = [sum(w * p[i] for w, p in zip(weights, poses)) / total for i in range(3)]
+        blended += [_weighted_angle([p[i] for p in poses], weights) for i in range(3, 6)]
+        tx = sum(w * v for w, v in zip(weights, txs)) / total
+        ty = sum(w * v for w, v in zip(weights, tys)) / total
+        area = own.area if own is not None else 0.0
+        return tx, ty, area, blended
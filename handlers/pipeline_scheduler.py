@@ -0,0 +1,97 @@
+from ntcore import NetworkTableInstance
+from wpilib import Timer
+
+from autonomous.auton_constants import LL_PIPELINES
+
+
+class PipelineScheduler:
+    """
+    Switches the Limelight between the LL_PIPELINES bands by the last measured tag
+    distance: high resolution far away so tags are detected at all, highest frame rate
+    close in. A band edge has to be crossed by "hysteresis" meters before switching,
+    switch requests are at most one per "min_switch_interval", and with no tag for
+    "lost_after" seconds it falls back to the farthest (detection) band.
+
+    The per-pipeline FPS comes from the handler's frame arrivals, so the handler's
+    ingest thread is started: read from the 50 Hz loop the rate could never show more
+    than 50.
+    """
+
+    def __init__(self, limelight_handler):
+        self.limelight_handler = limelight_handler
+        self.bands = LL_PIPELINES["bands"]
+
+        self.band = len(self.bands) - 1
+        self._last_switch = -LL_PIPELINES["min_switch_interval"]
+        self._last_target_time = Timer.getFPGATimestamp()
+        self.switch_count = 0
+
+        limelight_handler.start_ingest()
+
+        table = NetworkTableInstance.getDefault().getTable("Vision").getSubTable("Pipeline")
+        self._active_pub = table.getStringTopic("Active").publish()
+        self._fps_pubs = {
+            band["index"]: table.getDoubleTopic(f"{band['name']}/FPS").publish() for band in self.bands
+        }
+
+    def update(self, target):
+        """
+        Call once per loop, after the frame has been read, with the nearest target this
+        loop (None when there is none)
+        """
+        now = Timer.getFPGATimestamp()
+        handler = self.limelight_handler
+
+        frame = handler.read_results()
+
+        if target is not None:
+            self._last_target_time = now
+            desired = self._band_for_distance(target.distance)
+        elif now - self._last_target_time > LL_PIPELINES["lost_after"]:
+            desired = len(self.bands) - 1
+        else:
+            desired = self.band
+
+        wanted_index = self.bands[desired]["index"]
+        camera_index = frame.pipeline_id if frame is not None else None
+        if (desired != self.band or (camera_index is not None and camera_index != wanted_index)) \
+                and now - self._last_switch >= LL_PIPELINES["min_switch_interval"]:
+            if handler.pipeline_switch(wanted_index):
+                if desired != self.band:
+                    print(f"##### Limelight pipeline: {self.bands[self.band]['name']} -> {self.bands[desired]['name']}")
+                self.band = desired
+                self._last_switch = now
+                self.switch_count += 1
+
+        self._publish()
+
+    def _band_for_distance(self, distance):
+        """Band for this distance, only leaving the current band once past its edge plus hysteresis"""
+        hysteresis = LL_PIPELINES["hysteresis"]
+        current = self.bands[self.band]
+
+        # Farther out than the current band allows
+        if current["up_to"] is not None and distance > current["up_to"] + hysteresis:
+            band = self.band
+            while self.bands[band]["up_to"] is not None and distance > self.bands[band]["up_to"]:
+                band += 1
+            return band
+
+        # Well inside a nearer band
+        band = self.band
+        while band > 0 and distance < self.bands[band - 1]["up_to"] - hysteresis:
+            band -= 1
+        return band
+
+    def get_pipeline_fps(self):
+        """Effective FPS of each band's pipeline: frames over time spent in it"""
+        fps = {}
+        for band in self.bands:
+            stats = self.limelight_handler.pipeline_frame_stats.get(band["index"])
+            fps[band["index"]] = stats["frames"] / stats["seconds"] if stats and stats["seconds"] > 0 else 0
+        return fps
+
+    def _publish(self):
+        self._active_pub.set(self.bands[self.band]["name"])
+        for index, fps in self.get_pipeline_fps().items():
+            self._fps_pubs[index].set(fps)
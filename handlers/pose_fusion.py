@@ -0,0 +1,195 @@
+import math
+
+from ntcore import NetworkTableInstance
+from wpilib import DriverStation
+from wpimath.geometry import Pose2d, Rotation2d
+
+from autonomous.auton_constants import POSE_FUSION
+from handlers.limelight_handler import tag_stats
+
+
+def _botpose(frame, botpose):
+    """Pose2d from a Limelight botpose array, or None when there is no usable pose"""
+    if not frame.validity or botpose is None or len(botpose) < 6:
+        return None
+
+    x, y, yaw = botpose[0], botpose[1], botpose[5]
+    if not all(math.isfinite(v) for v in (x, y, yaw)) or (x == 0 and y == 0):
+        return None  # The camera reports all zeros when it has no pose
+
+    field = POSE_FUSION["field"]
+    if not (0 <= x <= field["length"] and 0 <= y <= field["width"]):
+        return None
+
+    return Pose2d(x, y, Rotation2d.fromDegrees(yaw))
+
+
+class VisionPoseFusion:
+    """
+    Feeds the Limelight's field pose (MegaTag2 or botpose_wpiblue) into the drivetrain's pose
+    estimator, once per new frame, stamped with the frame's capture time so the
+    Kalman filter applies it against the odometry from when the image was taken.
+    Standard deviations are worked out per frame from tag count, tag distance,
+    ambiguity and robot spin; frames that can't be trusted are rejected. A MegaTag2
+    pose is solved with our own gyro heading, so its heading is never fused back in.
+    """
+
+    REJECT_REASONS = ("no_pose", "ambiguity", "distance", "spin", "jump")
+
+    def __init__(self, drivetrain):
+        self.drivetrain = drivetrain
+        self._last_frame = None
+        self._jump_streak = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.resets = 0
+        self.rejections = {reason: 0 for reason in self.REJECT_REASONS}
+        self.std_devs = None
+
+        table = NetworkTableInstance.getDefault().getTable("Vision").getSubTable("Fusion")
+        self._pose_pub = table.getStructTopic("Pose", Pose2d).publish()
+        self._std_devs_pub = table.getDoubleArrayTopic("StdDevs").publish()
+        self._accepted_pub = table.getIntegerTopic("Accepted").publish()
+        self._rejected_pub = table.getIntegerTopic("Rejected").publish()
+        self._resets_pub = table.getIntegerTopic("Resets").publish()
+        self._rejection_pubs = {
+            reason: table.getIntegerTopic(f"Rejections/{reason}").publish() for reason in self.REJECT_REASONS
+        }
+
+    def update(self, frame):
+        """Call once per loop with the frame read this loop"""
+        if frame is None or frame is self._last_frame:
+            return
+        self._last_frame = frame
+
+        pose, megatag2 = self._field_pose(frame)
+        count, distance, ambiguity = tag_stats(frame)
+        if megatag2:
+            ambiguity = None  # The gyro heading removes the single-tag flip
+        omega = abs(self.drivetrain.get_state().speeds.omega)
+
+        reason = self._reject_reason(pose, count, distance, ambiguity, omega)
+        if reason == "reset":
+            # Vision has disagreed with the estimate for a while: trust the camera's position, keep the gyro heading
+            self.drivetrain.reset_translation(pose.translation())
+            self.resets += 1
+            print(f"##### Vision fusion: pose estimate reset to {pose.translation()}")
+        elif reason is not None:
+            self.rejected += 1
+            self.rejections[reason] += 1
+        else:
+            self.std_devs = self._std_devs(count, distance, ambiguity, omega, megatag2)
+            self.drivetrain.add_vision_measurement(pose, frame.capture_time, self.std_devs)
+            self.accepted += 1
+            self._pose_pub.set(pose)
+            self._std_devs_pub.set(list(self.std_devs))
+
+        self._accepted_pub.set(self.accepted)
+        self._rejected_pub.set(self.rejected)
+        self._resets_pub.set(self.resets)
+        for reason, pub in self._rejection_pubs.items():
+            pub.set(self.rejections[reason])
+
+    def _field_pose(self, frame):
+        """(robot pose on the field or None, whether it is the MegaTag2 pose)"""
+        if POSE_FUSION["pose_source"] == "megatag2":
+            pose = _botpose(frame, getattr(frame, "botpose_orb_wpiblue", None))
+            if pose is not None:
+                return pose, True
+        return _botpose(frame, frame.botpose_wpiblue), False
+
+    def _reject_reason(self, pose, count, distance, ambiguity, omega):
+        const = POSE_FUSION["reject"]
+        if pose is None or count == 0:
+            return "no_pose"
+        if count == 1 and ambiguity is not None and ambiguity > const["max_ambiguity"]:
+            return "ambiguity"
+        if distance > const["max_distance"]:
+            return "distance"
+        if omega > const["max_angular_velocity"]:
+            return "spin"
+
+        jump = pose.translation().distance(self.drivetrain.get_state().pose.translation())
+        if jump <= const["max_jump"]:
+            self._jump_streak = 0
+            return None
+        self._jump_streak += 1
+        if self._jump_streak < const["reset_after"]:
+            return "jump"
+        self._jump_streak = 0
+        return "reset"
+
+    def _std_devs(self, count, distance, ambiguity, omega, megatag2):
+        """(x, y, heading) standard deviations for a frame that passed the checks"""
+        const = POSE_FUSION["std_devs"]
+        scale = (1 + (distance / const["distance_scale"]) ** 2) / count
+        scale *= 1 + const["ambiguity_gain"] * (ambiguity or 0)
+        scale *= 1 + const["spin_gain"] * omega
+
+        xy = const["xy"] * scale
+        theta = const["single_tag_theta"] if count == 1 or megatag2 else const["theta"] * scale
+        return xy, xy, theta
+
+
+class VisionRelocalizer:
+    """
+    While disabled, averages several close multi-tag (MegaTag1, so the heading is the
+    camera's own) poses and seeds the drivetrain's pose estimate with them. It seeds
+    once, and again only if the robot is moved while still disabled.
+    """
+
+    def __init__(self, drivetrain):
+        self.drivetrain = drivetrain
+        self._last_frame = None
+        self._samples = []
+        self.seeds = 0
+
+        table = NetworkTableInstance.getDefault().getTable("Vision").getSubTable("Relocalize")
+        self._seed_pub = table.getStructTopic("Seed", Pose2d).publish()
+        self._seeds_pub = table.getIntegerTopic("Seeds").publish()
+
+    def update(self, frame):
+        """Call once per loop with the frame read this loop"""
+        if not DriverStation.isDisabled():
+            self._samples = []
+            return
+        if frame is None or frame is self._last_frame:
+            return
+        self._last_frame = frame
+
+        const = POSE_FUSION["relocalize"]
+        count, distance, _ = tag_stats(frame)
+        pose = _botpose(frame, frame.botpose_wpiblue)
+        if pose is None or count < const["min_tags"] or distance > const["max_distance"]:
+            return
+
+        self._samples.append(pose)
+        if len(self._samples) < const["samples"]:
+            return
+
+        average = self._average(self._samples)
+        samples = self._samples
+        self._samples = []
+        if any(p.translation().distance(average.translation()) > const["max_spread"] for p in samples):
+            return
+
+        current = self.drivetrain.get_state().pose
+        moved = current.translation().distance(average.translation())
+        turned = abs((current.rotation() - average.rotation()).degrees())
+        if self.seeds and moved <= const["reseed_distance"] and turned <= const["reseed_heading"]:
+            return
+
+        self.drivetrain.seed_pose(average)
+        self.seeds += 1
+        self._seed_pub.set(average)
+        self._seeds_pub.set(self.seeds)
+        print(f"##### Vision relocalize: pose estimate seeded at {average}")
+
+    @staticmethod
+    def _average(poses):
+        n = len(poses)
+        x = sum(p.x for p in poses) / n
+        y = sum(p.y for p in poses) / n
+        s = sum(p.rotation().sin() for p in poses)
+        c = sum(p.rotation().cos() for p in poses)
+        return Pose2d(x, y, Rotation2d(math.atan2(s, c)))
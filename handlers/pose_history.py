@@ -0,0 +1,58 @@
+import threading
+from bisect import bisect_left
+from collections import deque
+
+from wpimath.geometry import Pose2d, Rotation2d
+
+
+class PoseHistory:
+    """
+    Ring buffer of drivetrain poses keyed by timestamp, written from the odometry thread
+    and read from the robot loop. Timestamps are in whatever time base the writer uses
+    (the drivetrain's odometry time); sample() interpolates between neighbours.
+    """
+
+    def __init__(self, max_age=1.0):
+        self.max_age = max_age
+        self._times = deque()
+        self._poses = deque()
+        self._lock = threading.Lock()
+
+    def add(self, timestamp, pose):
+        with self._lock:
+            if self._times and timestamp <= self._times[-1]:
+                return
+            self._times.append(timestamp)
+            self._poses.append(pose)
+            while self._times[0] < timestamp - self.max_age:
+                self._times.popleft()
+                self._poses.popleft()
+
+    def latest(self):
+        """(timestamp, pose) of the newest sample, or None when empty"""
+        with self._lock:
+            if not self._times:
+                return None
+            return self._times[-1], self._poses[-1]
+
+    def sample(self, timestamp):
+        """Pose at timestamp, interpolated; None when it is older than the buffer"""
+        with self._lock:
+            if not self._times or timestamp < self._times[0]:
+                return None
+            if timestamp >= self._times[-1]:
+                return self._poses[-1]
+
+            i = bisect_left(self._times, timestamp)
+            t1, p1 = self._times[i], self._poses[i]
+            if i == 0 or t1 == timestamp:
+                return p1
+            t0, p0 = self._times[i - 1], self._poses[i - 1]
+
+        f = (timestamp - t0) / (t1 - t0)
+        turn = (p1.rotation() - p0.rotation()).radians()
+        return Pose2d(
+            p0.x + (p1.x - p0.x) * f,
+            p0.y + (p1.y - p0.y) * f,
+            Rotation2d(p0.rotation().radians() + turn * f)
+        )
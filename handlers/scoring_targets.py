@@ -0,0 +1,149 @@
+import json
+import os
+
+from wpilib import DriverStation
+from wpimath.geometry import Pose2d, Rotation2d, Transform2d
+
+from autonomous.auton_constants import FIELD_LAYOUT, SCORING
+from handlers.field_layout import get_field_layout
+
+_scoring_pose_table = None
+
+
+def get_scoring_pose_table():
+    """The robot's ScoringPoseTable, built (or read from the disk cache) on first use"""
+    global _scoring_pose_table
+    if _scoring_pose_table is None:
+        _scoring_pose_table = ScoringPoseTable()
+    return _scoring_pose_table
+
+
+class ScoringPoseTable:
+    """
+    Where the robot goes to score on each scoring tag: for the left and right branch
+    (as seen facing the tag) the scoring pose, a pose approach_distance farther out to
+    line up from, and the heading to hold (facing the tag). Built from the field layout
+    at startup and cached to SCORING["cache_path"]; the cache is rebuilt whenever the
+    layout or any of the geometry settings change.
+    """
+
+    VERSION = 2  # Bumped when the pose math changes, so old caches are rebuilt
+
+    def __init__(self):
+        const = SCORING["poses"]
+        self.tag_ids = sorted(tag_id for tag_ids in SCORING["tag_ids"].values() for tag_id in tag_ids)
+        self._key = {"version": self.VERSION, "layout": FIELD_LAYOUT, "tag_ids": self.tag_ids, **const}
+
+        self.table = self._load_cache()
+        if self.table is None:
+            self.table = self._build()
+            self._save_cache()
+
+    def _build(self):
+        const = SCORING["poses"]
+        layout = get_field_layout()
+        table = {}
+        for tag_id in self.tag_ids:
+            tag = layout.getTagPose(tag_id).toPose2d()
+            heading = (tag.rotation() + Rotation2d.fromDegrees(180)).degrees()  # Robot front faces the tag
+            sides = {}
+            # The tag's +y is to the right of someone facing it, so also the robot's right. A
+            # mechanism lateral_offset to the right puts the robot center that much left of the branch
+            for side, lateral in (("left", -const["branch_offset"]), ("right", const["branch_offset"])):
+                lateral -= const["lateral_offset"]
+                score = tag.transformBy(Transform2d(const["standoff"], lateral, Rotation2d.fromDegrees(180)))
+                approach = tag.transformBy(Transform2d(
+                    const["standoff"] + const["approach_distance"], lateral, Rotation2d.fromDegrees(180)))
+                sides[side] = {
+                    "pose": [score.x, score.y, score.rotation().degrees()],
+                    "approach": [approach.x, approach.y, approach.rotation().degrees()]
+                }
+            table[tag_id] = {"heading": heading, **sides}
+        print(f"##### Scoring poses: built for {len(table)} tags")
+        return table
+
+    def _load_cache(self):
+        path = SCORING["cache_path"]
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path) as f:
+                cached = json.load(f)
+            if cached.get("key") != self._key:
+                return None
+            return {int(tag_id): entry for tag_id, entry in cached["poses"].items()}
+        except (OSError, ValueError, KeyError) as e:
+            print(f"##### Scoring poses: ignoring cache {path}: {e}")
+            return None
+
+    def _save_cache(self):
+        path = SCORING["cache_path"]
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(path, "w") as f:
+                json.dump({"key": self._key, "poses": self.table}, f, indent=1)
+        except OSError as e:
+            print(f"##### Scoring poses: could not write cache {path}: {e}")
+
+    def scoring_pose(self, tag_id, side):
+        x, y, degrees = self.table[tag_id][side]["pose"]
+        return Pose2d(x, y, Rotation2d.fromDegrees(degrees))
+
+    def approach_pose(self, tag_id, side):
+        x, y, degrees = self.table[tag_id][side]["approach"]
+        return Pose2d(x, y, Rotation2d.fromDegrees(degrees))
+
+    def heading(self, tag_id):
+        return Rotation2d.fromDegrees(self.table[tag_id]["heading"])
+
+
+class ScoringTargetSelector:
+    """
+    Picks the scoring tag to drive to from the fused robot pose instead of whichever
+    tag happens to be closest to the camera. The nearest of our alliance's scoring
+    tags wins, but the previous pick is kept until another one is closer by more than
+    the hysteresis, so the choice doesn't flip between two faces. A pick the camera
+    can't see isn't returned: the vision handler would quietly hand back the closest
+    tag in its place.
+    """
+
+    def __init__(self, drivetrain, vision):
+        self.drivetrain = drivetrain
+        self.vision = vision
+        layout = get_field_layout()
+        self.tag_positions = {
+            alliance: {tag_id: layout.getTagPose(tag_id).toPose2d().translation() for tag_id in tag_ids}
+            for alliance, tag_ids in SCORING["tag_ids"].items()
+        }
+        self.selected = None
+
+    def select(self):
+        """Tag id to score on, or None to fall back to the closest tag in view"""
+        alliance = DriverStation.getAlliance()
+        if alliance is None:
+            return None
+        positions = self.tag_positions["red" if alliance == DriverStation.Alliance.kRed else "blue"]
+
+        robot = self.drivetrain.get_state().pose.translation()
+        distances = {tag_id: robot.distance(position) for tag_id, position in positions.items()}
+        nearest = min(distances, key=distances.get)
+
+        if self.selected in distances and nearest != self.selected \
+                and distances[nearest] + SCORING["hysteresis"] >= distances[self.selected]:
+            nearest = self.selected
+
+        if distances[nearest] > SCORING["max_distance"]:
+            self.selected = None
+            return None
+
+        if nearest != self.selected:
+            print(f"##### Scoring target: tag {nearest} ({distances[nearest]:.2f} m)")
+        self.selected = nearest
+
+        target = self.vision.get_target_data(nearest)
+        if target is None or target.tag_id != nearest:
+            print(f"##### Scoring target: tag {nearest} not in view, using the closest tag")
+            return None
+        return nearest
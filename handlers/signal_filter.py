@@ -0,0 +1,68 @@
+import math
+
+
+class AlphaBetaFilter:
+    """
+    Constant-velocity alpha-beta filter for one signal sampled at irregular times.
+    Keeps an estimate and its rate, plus a smoothed residual for judging how well
+    the model is tracking.
+    """
+
+    def __init__(self, alpha, beta):
+        self.alpha = alpha
+        self.beta = beta
+        self.reset()
+
+    def reset(self):
+        self.value = None
+        self.rate = 0.0
+        self.time = None
+        self.residual = 0.0
+        self.updates = 0
+
+    def update(self, measurement, timestamp):
+        if self.value is None:
+            self.value = measurement
+            self.time = timestamp
+            self.updates = 1
+            return self.value
+
+        dt = timestamp - self.time
+        if dt <= 0:
+            return self.value
+
+        predicted = self.value + self.rate * dt
+        residual = measurement - predicted
+        self.value = predicted + self.alpha * residual
+        self.rate += self.beta * residual / dt
+        self.time = timestamp
+        self.residual = 0.8 * self.residual + 0.2 * abs(residual)
+        self.updates += 1
+        return self.value
+
+
+class TargetFilter:
+    """Alpha-beta filters for one tag's mapped tx, yaw and distance"""
+
+    CHANNELS = ("tx", "yaw", "distance")
+
+    def __init__(self, alpha, beta):
+        self.filters = {channel: AlphaBetaFilter(alpha, beta) for channel in self.CHANNELS}
+        self.last_time = None
+
+    def update(self, mapped, timestamp, reset_after):
+        if self.last_time is not None and timestamp - self.last_time > reset_after:
+            for f in self.filters.values():
+                f.reset()
+        self.last_time = timestamp
+        for channel, f in self.filters.items():
+            value = getattr(mapped, channel)
+            if not math.isnan(value):  # Unknown this frame (NT yaw of a non-primary tag)
+                f.update(value, timestamp)
+
+    def confidence(self, noise, settle_frames):
+        """0..1: low until the filter has settled, and while measurements jump around more than the noise"""
+        updates = min(f.updates for f in self.filters.values())
+        settled = min(1.0, updates / settle_frames)
+        misfit = sum((f.residual / noise[channel]) ** 2 for channel, f in self.filters.items())
+        return settled / (1 + misfit)
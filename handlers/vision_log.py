@@ -0,0 +1,207 @@
+import math
+import os
+import struct
+import time
+
+from wpilib import Timer
+
+from handlers.limelight_nt import NTFiducialResult, NTGeneralResult
+
+
+# File layout: MAGIC, then per frame one _FRAME record followed by n_tags _TAG records.
+# _FRAME: arrival_time (FPGA s), timestamp (ms), capture_latency, targeting_latency (ms),
+#         validity, pipeline_id, botpose_wpiblue (6), botpose_orb_wpiblue (6), n_tags
+# _TAG:   id, tx, ty, ta, ambiguity, target_pose_camera_space (6), robot_pose_target_space (6)
+# Values the frame did not have are stored as NaN.
+MAGIC = b"LLV2"
+_FRAME = struct.Struct("<ddffBB6f6fB")
+_TAG = struct.Struct("<H4f6f6f")
+
+_NAN6 = (math.nan,) * 6
+
+
+def _pose6(values):
+    return tuple(values[:6]) if values is not None and len(values) >= 6 else _NAN6
+
+
+def _pose_or_none(values):
+    return None if math.isnan(values[0]) else list(values)
+
+
+def _list_or_empty(values):
+    return [] if math.isnan(values[0]) else list(values)
+
+
+def _none_if_nan(value):
+    return None if math.isnan(value) else value
+
+
+class VisionRecorder:
+    """
+    Appends every new Limelight frame to a compact binary log. When the file would grow
+    past max_bytes it is moved to "<path>.1" (replacing the older one) and a new file is
+    started, so at most about 2 * max_bytes are kept on disk. A log left by the previous
+    run (a redeploy or brownout after a match) is moved to "<path>.1" the same way
+    instead of being overwritten.
+    """
+
+    def __init__(self, path, max_bytes, flush_period=1.0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.flush_period = flush_period
+        self.frames_written = 0
+        self.rollovers = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = None
+        self._size = 0
+        self._last_flush = time.monotonic()
+        if os.path.exists(path) and os.path.getsize(path) > len(MAGIC):
+            os.replace(path, path + ".1")
+        self._open()
+
+    def _open(self):
+        self._file = open(self.path, "wb")
+        self._file.write(MAGIC)
+        self._size = len(MAGIC)
+
+    def write(self, parsed_result, fiducials):
+        """Log one frame; fiducials are (id, tx, ty, ta, ambiguity, pose_cs, pose_ts) tuples"""
+        tags = [
+            _TAG.pack(int(tag_id), tx, ty, ta, math.nan if ambiguity is None else ambiguity,
+                      *_pose6(pose_cs), *_pose6(pose_ts))
+            for tag_id, tx, ty, ta, ambiguity, pose_cs, pose_ts in fiducials[:255]
+        ]
+        record = _FRAME.pack(
+            parsed_result.arrival_time, parsed_result.timestamp,
+            parsed_result.capture_latency, parsed_result.targeting_latency,
+            int(bool(parsed_result.validity)), int(parsed_result.pipeline_id) & 0xFF,
+            *_pose6(parsed_result.botpose_wpiblue),
+            *_pose6(getattr(parsed_result, "botpose_orb_wpiblue", None)), len(tags)
+        ) + b"".join(tags)
+
+        if self._size + len(record) > self.max_bytes:
+            self._rollover()
+        self._file.write(record)
+        self._size += len(record)
+        self.frames_written += 1
+
+        now = time.monotonic()
+        if now - self._last_flush >= self.flush_period:
+            self._file.flush()
+            self._last_flush = now
+
+    def _rollover(self):
+        self._file.close()
+        os.replace(self.path, self.path + ".1")
+        self.rollovers += 1
+        self._open()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def read_log(path):
+    """All frames in a vision log as NTGeneralResult objects, arrival_time as recorded"""
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a vision log")
+
+    frames = []
+    offset = len(MAGIC)
+    while offset + _FRAME.size <= len(data):
+        values = _FRAME.unpack_from(data, offset)
+        offset += _FRAME.size
+        arrival, timestamp, cl, tl, validity, pipeline_id = values[:6]
+        botpose = values[6:12]
+        botpose_orb = values[12:18]
+        n_tags = values[18]
+        if offset + n_tags * _TAG.size > len(data):
+            break  # Last record cut off by a power loss
+
+        fiducials = []
+        for _ in range(n_tags):
+            tag = _TAG.unpack_from(data, offset)
+            offset += _TAG.size
+            fiducials.append(NTFiducialResult(
+                tag[0], tag[1], tag[2], tag[3], _pose_or_none(tag[5:11]), _pose_or_none(tag[11:17]),
+                _none_if_nan(tag[4])))
+
+        frames.append(NTGeneralResult(
+            validity=validity, fiducial_results=fiducials, timestamp=timestamp,
+            capture_latency=cl, targeting_latency=tl, pipeline_id=pipeline_id,
+            botpose_wpiblue=_list_or_empty(botpose), arrival_time=arrival,
+            botpose_orb_wpiblue=_list_or_empty(botpose_orb)))
+    return frames
+
+
+class VisionReplaySource:
+    """
+    Plays a vision log back through the same interface as LimelightNTSource. Frames are
+    released on the FPGA clock at "speed" times real time, re-stamped to the replay
+    time. With speed 0 nothing advances on its own and step() releases the next frame,
+    for running through a log as fast as the caller can go.
+    """
+
+    def __init__(self, path, speed=1.0):
+        self.frames = read_log(path)
+        self.speed = speed
+        self.position = -1
+        self._start = None
+        self._current = None
+        print(f"##### Limelight replay: {len(self.frames)} frames from {path}")
+
+    def finished(self):
+        return self.position >= len(self.frames) - 1
+
+    def step(self):
+        """Release the next frame; False at the end of the log"""
+        if self.finished():
+            return False
+        self._release(self.position + 1, Timer.getFPGATimestamp())
+        return True
+
+    def _release(self, position, arrival):
+        recorded = self.frames[position]
+        self.position = position
+        self._current = NTGeneralResult(
+            validity=recorded.validity, fiducial_results=recorded.fiducialResults,
+            timestamp=recorded.timestamp, capture_latency=recorded.capture_latency,
+            targeting_latency=recorded.targeting_latency, pipeline_id=recorded.pipeline_id,
+            botpose_wpiblue=recorded.botpose_wpiblue, arrival_time=arrival,
+            botpose_orb_wpiblue=recorded.botpose_orb_wpiblue)
+
+    def read_results(self):
+        if self.speed and self.frames:
+            now = Timer.getFPGATimestamp()
+            if self._start is None:
+                self._start = now
+            first = self.frames[0].arrival_time
+            elapsed = (now - self._start) * self.speed
+
+            # Newest frame that is due, like a camera that only keeps its latest result
+            position = self.position
+            while position + 1 < len(self.frames) and self.frames[position + 1].arrival_time - first <= elapsed:
+                position += 1
+            if position != self.position:
+                arrival = self._start + (self.frames[position].arrival_time - first) / self.speed
+                self._release(position, arrival)
+        return self._current
+
+    # Camera control calls have nothing to talk to during a replay
+    def pipeline_switch(self, index):
+        pass
+
+    def set_priority_id(self, tag_id):
+        pass
+
+    def set_fiducial_filter(self, tag_ids):
+        pass
+
+    def set_robot_orientation(self, orientation):
+        pass
@@ -0,0 +1,137 @@
+import math
+
+from commands2 import SubsystemBase
+
+from autonomous.auton_constants import LL_PIPELINES, LL_SETTINGS, POSE_FUSION
+from handlers.limelight_handler import LimelightHandler
+from handlers.pipeline_scheduler import PipelineScheduler
+from handlers.pose_fusion import VisionPoseFusion, VisionRelocalizer
+
+_vision_service = None
+
+
+def get_vision_service():
+    """The one VisionService for the robot process, created on first use"""
+    global _vision_service
+    if _vision_service is None:
+        _vision_service = VisionService()
+    return _vision_service
+
+
+class VisionService(SubsystemBase):
+    """
+    Owns the robot's single LimelightHandler. Once per loop (subsystem periodic runs
+    before command execute) it reads the newest frame and works out the target data
+    for every subscribed tag id, so commands just pick up the precomputed answer.
+    A tag id of None means "closest tag".
+    """
+
+    def __init__(self, limelight_handler=None):
+        print(f"##### Vision service I")
+        super().__init__()
+
+        self.limelight_handler = limelight_handler if limelight_handler is not None else LimelightHandler(debug=True)
+
+        self.pipeline_scheduler = PipelineScheduler(self.limelight_handler) if LL_PIPELINES["enabled"] else None
+        self.pose_fusion = None
+        self.relocalizer = None
+        self.drivetrain = None
+
+        self._subscriptions = {}
+        self._frame = None
+        self._results = {}
+
+    def attach_drivetrain(self, drivetrain):
+        """Start feeding the drivetrain heading to the camera and camera poses into the pose estimator"""
+        self.drivetrain = drivetrain
+        if POSE_FUSION["enabled"]:
+            self.pose_fusion = VisionPoseFusion(drivetrain)
+        if POSE_FUSION["relocalize"]["enabled"]:
+            self.relocalizer = VisionRelocalizer(drivetrain)
+
+    def subscribe(self, target_tag_id=None):
+        self._subscriptions[target_tag_id] = self._subscriptions.get(target_tag_id, 0) + 1
+
+    def unsubscribe(self, target_tag_id=None):
+        count = self._subscriptions.get(target_tag_id, 0) - 1
+        if count > 0:
+            self._subscriptions[target_tag_id] = count
+        else:
+            self._subscriptions.pop(target_tag_id, None)
+            self._results.pop(target_tag_id, None)
+
+    def periodic(self):
+        if LL_SETTINGS["fiducial_filter"]["enabled"]:
+            self._update_fiducial_filter()
+
+        self._frame = self.limelight_handler.read_results()
+        if self.drivetrain is not None and LL_SETTINGS["megatag2"]["orientation_feed"]:
+            state = self.drivetrain.get_state()
+            self.limelight_handler.set_robot_orientation(
+                state.pose.rotation().degrees(), math.degrees(state.speeds.omega))
+        self._results = {
+            tag_id: self._compensate(self.limelight_handler.get_target_data(tag_id))
+            for tag_id in self._subscriptions
+        }
+        if self.relocalizer is not None:
+            self.relocalizer.update(self._frame)
+        if self.pose_fusion is not None:
+            self.pose_fusion.update(self._frame)
+        if self.pipeline_scheduler is not None:
+            self.pipeline_scheduler.update(self._nearest_target())
+        self.limelight_handler.publish_stats()
+
+    def _nearest_target(self):
+        """
+        Nearest of this loop's subscribed targets, or with no subscribers the closest tag
+        in view, read without moving the NT priority id off the subscribed tag
+        """
+        if not self._subscriptions:
+            return self.limelight_handler.get_target_data(set_priority=False)
+        return min((t for t in self._results.values() if t is not None), key=lambda t: t.distance, default=None)
+
+    def _compensate(self, target):
+        """Project the target from the frame's capture time to now using the drivetrain pose history"""
+        if target is None or self.drivetrain is None or self._frame is None \
+                or not LL_SETTINGS["latency_compensation"]["enabled"]:
+            return target
+
+        then = self.drivetrain.sample_pose_history(self._frame.capture_time)
+        latest = self.drivetrain.pose_history.latest()
+        if then is None or latest is None:
+            return target
+        return self.limelight_handler.project_target(target, latest[1].relativeTo(then))
+
+    def predict_target(self, target, seen_pose):
+        """Where a target last seen with the robot at seen_pose should be now, from odometry alone"""
+        if self.drivetrain is None:
+            return None
+        return self.limelight_handler.project_target(target, self.drivetrain.get_state().pose.relativeTo(seen_pose))
+
+    def _update_fiducial_filter(self):
+        """
+        While every subscriber wants a specific tag, the camera only looks for those tags.
+        Any "closest tag" subscriber, or no subscribers at all, clears the filter. With
+        multi-tag blending on, tags within its max_tag_separation are kept as well. The camera
+        also applies the filter to its MegaTag botpose, so while pose fusion is running the
+        filter stays off rather than cutting localization to one tag during every alignment.
+        """
+        if not self._subscriptions or None in self._subscriptions or self.pose_fusion is not None:
+            self.limelight_handler.set_fiducial_filter(None)
+        elif self.limelight_handler.multi_tag is not None:
+            # Multi-tag blending needs the neighbours in view too, not just the requested tags
+            multi_tag = self.limelight_handler.multi_tag
+            self.limelight_handler.set_fiducial_filter(
+                set().union(*(multi_tag.neighbours(tag_id) for tag_id in self._subscriptions)))
+        else:
+            self.limelight_handler.set_fiducial_filter(self._subscriptions.keys())
+
+    def read_results(self):
+        """The frame read at the start of this loop"""
+        return self._frame
+
+    def get_target_data(self, target_tag_id=None):
+        if target_tag_id in self._results:
+            return self._results[target_tag_id]
+        # Not subscribed (or subscribed mid-loop): the handler's per-frame cache still avoids a re-parse
+        return self._compensate(self.limelight_handler.get_target_data(target_tag_id))
@@ -3,7 +3,7 @@ from difflib import restore
 from wpilib.event import EventLoop
 from wpilib import SmartDashboard, SendableChooser, DriverStation
 
-from commands2 import Command, InstantCommand, CommandScheduler, SequentialCommandGroup
+from commands2 import Command, InstantCommand, CommandScheduler, SequentialCommandGroup, DeferredCommand
 from commands2.button import Trigger
 from commands2.button import CommandXboxController
 from commands2.sysid import SysIdRoutine
@@ -27,7 +27,8 @@ from autonomous.auton_drive import AutonDrive
 from autonomous.auton_modes import AutonModes
 from autonomous.auton_mode_selector import create_auton_chooser
 
-from handlers.limelight_handler import LimelightHandler
+from handlers.vision_service import get_vision_service
+from handlers.scoring_targets import ScoringTargetSelector, get_scoring_pose_table
 
 
 class RobotContainer:
@@ -46,7 +47,8 @@ class RobotContainer:
         self.controller_operator = CommandXboxController(1)  # Operator controller for mechanisms
 
         # Initialize subsystems
-        self.limelight_handler = LimelightHandler(debug=True)
+        self.vision = get_vision_service()
+        self.limelight_handler = self.vision.limelight_handler
         self.elevator = Elevator()
         self.arm = Arm()
         self.shooter = Shooter()
@@ -81,11 +83,14 @@ class RobotContainer:
         self._logger = Telemetry(self._max_speed)
 
         self.drivetrain = TunerConstants.create_drivetrain()
+        self.vision.attach_drivetrain(self.drivetrain)
+        self.target_selector = ScoringTargetSelector(self.drivetrain, self.vision)
+        get_scoring_pose_table()  # Build (or load) the scoring poses now rather than mid-auton
 
         # Initiate command schedule functions for autonomous tasks
         self.auton_operator = AutonOperator(self.elevator, self.arm, self.shooter, self.climber)
         self.auton_drive = AutonDrive(self.drivetrain, self._drive_rc, self._max_speed, self._max_angular_rate,
-                                      self.limelight_handler)
+                                      self.vision)
 
         self.robot_centric = False
         self.default_command = None
@@ -225,7 +230,12 @@ class RobotContainer:
 
         def auto_seek_and_shoot(direction: str):
             self.is_running = True
-            return self.auton_modes.seek_and_shoot(None, direction)
+            # Built on each press so the target comes from where the robot is at that moment.
+            # seek_and_shoot's only requirements come from auton_operator.shoot()
+            return DeferredCommand(
+                lambda: self.auton_modes.seek_and_shoot(self.target_selector.select(), direction),
+                self.elevator, self.arm, self.shooter
+            )
 
         def auto_seek_and_shoot_end(ctrl):
             print(f"----------------!!!!!!!!!!!!! self.is_running {self.is_running}")
@@ -1,11 +1,18 @@
-from commands2 import Command, Subsystem
+from commands2 import Command, FunctionalCommand, Subsystem
 from commands2.sysid import SysIdRoutine
 import math
 from phoenix6 import SignalLogger, swerve, units, utils
 from typing import Callable, overload
-from wpilib import DriverStation, Notifier, RobotController
+from wpilib import DriverStation, Notifier, RobotController, Timer
 from wpilib.sysid import SysIdRoutineLog
+from wpimath.controller import ProfiledPIDController, ProfiledPIDControllerRadians
 from wpimath.geometry import Pose2d, Rotation2d
+from wpimath.kinematics import ChassisSpeeds
+from wpimath.trajectory import TrapezoidProfile, TrapezoidProfileRadians
+
+from autonomous.auton_constants import DRIVE_TO_POSE
+from handlers.drivetrain_provider import check_no_drivetrain, register_drivetrain
+from handlers.pose_history import PoseHistory
 
 
 class CommandSwerveDrivetrain(Subsystem, swerve.SwerveDrivetrain):
@@ -27,6 +34,12 @@ class CommandSwerveDrivetrain(Subsystem, swerve.SwerveDrivetrain):
     _RED_ALLIANCE_PERSPECTIVE_ROTATION = Rotation2d.fromDegrees(180)
     """Red alliance sees forward as 180 degrees (toward blue alliance wall)"""
 
+    def __new__(cls, *args, **kwargs):
+        # Subsystem.__new__ registers the instance with the CommandScheduler, so a second
+        # drivetrain has to be refused before that, not in __init__
+        check_no_drivetrain()
+        return super().__new__(cls, *args, **kwargs)
+
     @overload
     def __init__(
         self,
@@ -145,6 +158,7 @@ class CommandSwerveDrivetrain(Subsystem, swerve.SwerveDrivetrain):
         arg2=None,
         arg3=None,
     ):
+        register_drivetrain(self)
         Subsystem.__init__(self)
         swerve.SwerveDrivetrain.__init__(
             self, drive_motor_type, steer_motor_type, encoder_type,
@@ -156,6 +170,15 @@ class CommandSwerveDrivetrain(Subsystem, swerve.SwerveDrivetrain):
 
         self._has_applied_operator_perspective = False
         """Keep track if we've ever applied the operator perspective before or not"""
+        self._applied_alliance = None
+        """Alliance the operator perspective was last applied for"""
+        self._pose_seeded = False
+        """Set once the pose estimate has been seeded from a real measurement (vision relocalization)"""
+
+        self.pose_history = PoseHistory()
+        """Recent poses from the odometry thread, for looking up where the robot was at a camera capture"""
+        self._telemetry_function = None
+        swerve.SwerveDrivetrain.register_telemetry(self, self._on_odometry_update)
 
         # Swerve requests to apply during SysId characterization
         self._translation_characterization = swerve.requests.SysIdSwerveTranslation()
@@ -253,6 +276,113 @@ class CommandSwerveDrivetrain(Subsystem, swerve.SwerveDrivetrain):
 
         return self.run(lambda: self.set_control(request()))
 
+    def drive_to_pose(self, target_pose: Pose2d, constraints: dict | None = None) -> Command:
+        """
+        Returns a command that drives to a field pose (blue origin) in one motion.
+        The distance to the goal and the heading each follow a trapezoid profile; the
+        profile velocity is fed forward and a PID corrects the fused pose against the
+        profile position. The translation speed points straight at the goal, so the
+        robot drives a line and never goes faster than max_velocity diagonally. The
+        command finishes once the robot is within the position and heading tolerances
+        and has slowed below the velocity tolerance (or on timeout).
+
+        :param target_pose: Pose to drive to
+        :type target_pose: Pose2d
+        :param constraints: Overrides for any of the DRIVE_TO_POSE settings
+        :type constraints: dict | None
+        :returns: Command to run
+        :rtype: Command
+        """
+        const = {**DRIVE_TO_POSE, **(constraints or {})}
+
+        linear = TrapezoidProfile.Constraints(const["max_velocity"], const["max_acceleration"])
+        # Profiles the remaining distance down to zero
+        distance_controller = ProfiledPIDController(const["translation_kp"], 0, const["translation_kd"], linear)
+        theta_controller = ProfiledPIDControllerRadians(
+            const["heading_kp"], 0, const["heading_kd"],
+            TrapezoidProfileRadians.Constraints(const["max_angular_velocity"], const["max_angular_acceleration"])
+        )
+        theta_controller.enableContinuousInput(-math.pi, math.pi)
+
+        request = (
+            swerve.requests.ApplyFieldSpeeds()
+            .with_forward_perspective(swerve.requests.ForwardPerspectiveValue.BLUE_ALLIANCE)
+            .with_drive_request_type(swerve.SwerveModule.DriveRequestType.VELOCITY)
+        )
+        timer = Timer()
+
+        def initialize():
+            # Start the profiles from where the robot is and how fast it is already moving
+            state = self.get_state()
+            speeds = ChassisSpeeds.fromRobotRelativeSpeeds(state.speeds, state.pose.rotation())
+            offset = state.pose.translation() - target_pose.translation()
+            distance = offset.norm()
+            # Only the part of the current velocity along the line changes the distance
+            distance_rate = (speeds.vx * offset.x + speeds.vy * offset.y) / distance if distance > 1e-6 else 0.0
+            distance_controller.reset(distance, distance_rate)
+            distance_controller.setGoal(0)
+            theta_controller.reset(state.pose.rotation().radians(), speeds.omega)
+            theta_controller.setGoal(target_pose.rotation().radians())
+            timer.restart()
+            print(f"##### Drive to pose: {target_pose}")
+
+        def execute():
+            # get_state() is the newest sample from the odometry thread
+            pose = self.get_state().pose
+            offset = pose.translation() - target_pose.translation()
+            distance = offset.norm()
+            # Rate of change of the distance (negative closes it), split along the line to the goal
+            speed = distance_controller.calculate(distance) + distance_controller.getSetpoint().velocity
+            vx = speed * offset.x / distance if distance > 1e-6 else 0.0
+            vy = speed * offset.y / distance if distance > 1e-6 else 0.0
+            omega = theta_controller.calculate(pose.rotation().radians()) + theta_controller.getSetpoint().velocity
+            self.set_control(request.with_speeds(ChassisSpeeds(vx, vy, omega)))
+
+        def end(interrupted):
+            self.set_control(request.with_speeds(ChassisSpeeds()))
+            pose = self.get_state().pose
+            print(f"##### Drive to pose {'interrupted' if interrupted else 'done'} after {timer.get():.2f}s, "
+                  f"off by {pose.translation().distance(target_pose.translation()):.3f} m")
+
+        def is_finished():
+            if timer.hasElapsed(const["timeout"]):
+                return True
+            state = self.get_state()
+            position_error = state.pose.translation().distance(target_pose.translation())
+            heading_error = abs((state.pose.rotation() - target_pose.rotation()).degrees())
+            speed = math.hypot(state.speeds.vx, state.speeds.vy)
+            return (position_error < const["position_tolerance"]
+                    and heading_error < const["heading_tolerance"]
+                    and speed < const["velocity_tolerance"]
+                    and abs(state.speeds.omega) < const["velocity_tolerance"])
+
+        return FunctionalCommand(initialize, execute, end, is_finished, self)
+
+    def register_telemetry(self, telemetry_function: Callable[[swerve.SwerveDrivetrain.SwerveDriveState], None]):
+        """
+        Register a function to run with each drive state from the odometry thread.
+        The pose history keeps recording alongside it.
+
+        :param telemetry_function: Function to call with the drive state
+        :type telemetry_function: Callable[[swerve.SwerveDrivetrain.SwerveDriveState], None]
+        """
+        self._telemetry_function = telemetry_function
+
+    def _on_odometry_update(self, state: swerve.SwerveDrivetrain.SwerveDriveState):
+        self.pose_history.add(state.timestamp, state.pose)
+        if self._telemetry_function is not None:
+            self._telemetry_function(state)
+
+    def sample_pose_history(self, timestamp: units.second) -> Pose2d | None:
+        """
+        Pose of the robot at an FPGA timestamp (e.g. a camera capture time), interpolated
+        from the pose history. None when the timestamp is older than the history.
+
+        :param timestamp: FPGA timestamp in seconds
+        :type timestamp: units.second
+        """
+        return self.pose_history.sample(utils.fpga_to_current_time(timestamp))
+
     def sys_id_quasistatic(self, direction: SysIdRoutine.Direction) -> Command:
         """
         Runs the SysId Quasistatic test in the given direction for the routine
@@ -283,20 +413,36 @@ class CommandSwerveDrivetrain(Subsystem, swerve.SwerveDrivetrain):
         # This allows us to correct the perspective in case the robot code restarts mid-match.
         # Otherwise, only check and apply the operator perspective if the DS is disabled.
         # This ensures driving behavior doesn't change until an explicit disable event occurs during testing.
+        # The perspective (and the fallback starting pose, until vision has seeded the
+        # estimate) is only re-applied when the alliance actually changes.
         if not self._has_applied_operator_perspective or DriverStation.isDisabled():
             alliance_color = DriverStation.getAlliance()
-            if alliance_color is not None:
+            if alliance_color is not None and alliance_color != self._applied_alliance:
                 if alliance_color == DriverStation.Alliance.kRed:
-                    self.reset_pose(Pose2d(7,5,self._BLUE_ALLIANCE_PERSPECTIVE_ROTATION))
+                    if not self._pose_seeded:
+                        self.reset_pose(Pose2d(7,5,self._BLUE_ALLIANCE_PERSPECTIVE_ROTATION))
                     # self.reset_rotation(self._BLUE_ALLIANCE_PERSPECTIVE_ROTATION)
                     self.set_operator_perspective_forward(self._RED_ALLIANCE_PERSPECTIVE_ROTATION)
                 else:
-                    self.reset_pose(Pose2d(7,5,self._RED_ALLIANCE_PERSPECTIVE_ROTATION))
+                    if not self._pose_seeded:
+                        self.reset_pose(Pose2d(7,5,self._RED_ALLIANCE_PERSPECTIVE_ROTATION))
                     # self.reset_rotation(self._RED_ALLIANCE_PERSPECTIVE_ROTATION)
                     self.set_operator_perspective_forward(self._BLUE_ALLIANCE_PERSPECTIVE_ROTATION)
 
+                self._applied_alliance = alliance_color
                 self._has_applied_operator_perspective = True
 
+    def seed_pose(self, pose: Pose2d):
+        """
+        Reset the pose estimate to a measured pose, e.g. from vision relocalization.
+        From then on the fallback starting pose is no longer applied on alliance changes.
+
+        :param pose: Measured robot pose on the field (blue origin)
+        :type pose: Pose2d
+        """
+        self.reset_pose(pose)
+        self._pose_seeded = True
+
     def _start_sim_thread(self):
         def _sim_periodic():
             current_time = utils.get_current_time_seconds()
@@ -1,5 +1,5 @@
 from commands2 import Command
-from handlers.limelight_handler import LimelightHandler
+from handlers.vision_service import get_vision_service
 from wpilib import Timer
 
 
@@ -13,7 +13,7 @@ class Drive(Command):
         self.addRequirements(self.drivetrain)  # Ensure drivetrain ownership
         self.apply_request_command = None  # Store the command
 
-        self.limelight_handler = LimelightHandler(debug=True)
+        self.vision = get_vision_service()  # shared camera session, no second discovery
         self.arrived_target = 0.22
 
     def initialize(self):
@@ -21,7 +21,7 @@ class Drive(Command):
         print("Initializing DriveCommand...")
 
     def execute(self):
-        result = self.limelight_handler.read_results()
+        result = self.vision.read_results()
         if result and result.validity and result.fiducialResults:
             print(f"-------")
             print(f"-------")
@@ -2,9 +2,10 @@ from commands2 import Command
 from phoenix6.swerve.requests import FieldCentric
 from generated import tuner_constants
 import math
-from generated.tuner_constants import TunerConstants
 import time
 
+from handlers.drivetrain_provider import get_drivetrain
+
 class DriveToAprilTagTest(Command):
     def __init__(self, drivetrain, speed):
         super().__init__()
@@ -34,14 +35,14 @@ class RotateToAprilTag(Command):
     def __init__(self, drive, limelight_handler, max_angular_rate):
         print("rotate_to_april_tag init")
         super().__init__()
-        self.drivetrain = TunerConstants.create_drivetrain()
+        self.drivetrain = get_drivetrain()
         self.drive = drive
         self.limelight_handler = limelight_handler
         self.max_angular_rate = max_angular_rate
         self.target_acquired = False
 
         # Declare subsystem dependencies
-        self.addRequirements(self.drive)
+        self.addRequirements(self.drivetrain)
 
     def initialize(self):
         """Called when the command is initially scheduled."""
@@ -67,7 +68,7 @@ class RotateToAprilTag(Command):
                 print("----- Applying rotation request:", rotation_request)
                 
                 # Apply request directly to drivetrain
-                self.drivetrain.apply_request(rotation_request)
+                self.drivetrain.set_control(rotation_request)
                 
             else:
                 self.target_acquired = True
@@ -81,14 +82,14 @@ class RotateToAprilTag(Command):
     def end(self, interrupted):
         """Called once the command ends or is interrupted."""
         print(f"rotate_to_april_tag ended, interrupted={interrupted}")
-        self.drive.with_rotational_rate(0)  # Stop the drivetrain
+        self.drivetrain.set_control(self.drive.with_rotational_rate(0))  # Stop the drivetrain
 
 
 class DriveToAprilTag(Command):
     def __init__(self, drivetrain, drive, limelight_handler, max_speed, max_angular_rate):
         print("drive_to_april_tag init")
         super().__init__()
-        self.drivetrain = TunerConstants.create_drivetrain()
+        self.drivetrain = drivetrain if drivetrain is not None else get_drivetrain()
         self.drive = drive
         self.limelight_handler = limelight_handler
         self.max_speed = max_speed
@@ -100,7 +101,7 @@ class DriveToAprilTag(Command):
         self.arrived_target = 0.22
 
         # Declare subsystem dependencies
-        self.addRequirements(self.drive)
+        self.addRequirements(self.drivetrain)
 
     def initialize(self):
         """Called when the command is initially scheduled."""
@@ -199,7 +200,7 @@ class DriveToAprilTag(Command):
             print(f"Drivetrain Object: {self.drivetrain}")
 
 
-            self.drivetrain.apply_request(lambda: self.drive.with_velocity_y(3))
+            self.drivetrain.set_control(self.drive.with_velocity_y(3))
 
         #
         #     # Check if we've reached target
@@ -220,4 +221,4 @@ class DriveToAprilTag(Command):
         print(f"drive_to_april_tag ended, interrupted={interrupted}")
         # Stop all movement
         stop_request = self.drive.with_velocity_x(0).with_rotational_rate(0)
-        self.drivetrain.apply_request(stop_request)
\ No newline at end of file
+        self.drivetrain.set_control(stop_request)
\ No newline at end of file
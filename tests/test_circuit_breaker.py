@@ -0,0 +1,89 @@
+import threading
+import time
+
+from handlers.circuit_breaker import CircuitBreaker
+
+
+def _breaker(probe=lambda: True, call_timeout=0.05, max_failures=3):
+    return CircuitBreaker("Test", probe, call_timeout, max_failures, probe_period=0.01, probe_timeout=0.5)
+
+
+def _fail():
+    raise ConnectionError("camera unreachable")
+
+
+def _wait_for(condition, timeout=1.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.005)
+    return True
+
+
+def _submit_and_wait(breaker, fn):
+    assert breaker.submit(fn)
+    assert _wait_for(lambda: breaker._pending.done())
+    time.sleep(0.01)  # Let the done callback record the outcome
+
+
+def test_opens_after_consecutive_failures():
+    breaker = _breaker(probe=lambda: False)
+    for _ in range(3):
+        assert not breaker.is_open()
+        _submit_and_wait(breaker, _fail)
+
+    assert breaker.is_open()
+    assert breaker.trips == 1
+    assert breaker.total_failures == 3
+    # Open: nothing is sent to the worker
+    assert not breaker.submit(lambda: None)
+
+
+def test_success_resets_failure_count():
+    breaker = _breaker()
+    _submit_and_wait(breaker, _fail)
+    _submit_and_wait(breaker, _fail)
+    _submit_and_wait(breaker, lambda: None)
+    _submit_and_wait(breaker, _fail)
+
+    assert not breaker.is_open()
+    assert breaker.consecutive_failures == 1
+    assert breaker.total_failures == 3
+
+
+def test_slow_success_is_not_a_failure():
+    breaker = _breaker(call_timeout=0.01)
+    _submit_and_wait(breaker, lambda: time.sleep(0.05))
+    assert breaker.total_failures == 0
+
+
+def test_stuck_call_counts_once_past_deadline():
+    release = threading.Event()
+    breaker = _breaker(call_timeout=0.05)
+    assert breaker.submit(release.wait)
+
+    # Still inside the deadline: refused, but not a failure
+    assert not breaker.submit(lambda: None)
+    assert breaker.total_failures == 0
+
+    time.sleep(0.08)
+    assert not breaker.submit(lambda: None)
+    assert breaker.total_failures == 1
+    release.set()
+
+
+def test_probe_closes_breaker():
+    answering = threading.Event()
+    breaker = _breaker(probe=answering.is_set, max_failures=1)
+    _submit_and_wait(breaker, _fail)
+    assert breaker.is_open()
+
+    time.sleep(0.05)
+    assert breaker.is_open()  # Probes keep failing while the camera is down
+
+    answering.set()
+    assert _wait_for(lambda: not breaker.is_open())
+    assert breaker.consecutive_failures == 0
+    assert _wait_for(lambda: breaker._pending.done())
+    assert breaker.submit(lambda: None)
@@ -0,0 +1,111 @@
+from wpilib.simulation import pauseTiming, resumeTiming, stepTiming
+
+from handlers.drive_setpoint import DriveSetpointMailbox
+
+
+class FakeRequest:
+    """Records the values set through the with_* calls, like the phoenix6 requests chain"""
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.values = {}
+
+    def __getattr__(self, name):
+        if not name.startswith("with_"):
+            raise AttributeError(name)
+
+        def setter(value):
+            self.values[name[len("with_"):]] = value
+            return self
+        return setter
+
+
+class FakeCommand:
+    def __init__(self, fn):
+        self.fn = fn
+        self.scheduled = False
+        self.schedules = 0
+
+    def setName(self, name):
+        pass
+
+    def isScheduled(self):
+        return self.scheduled
+
+    def schedule(self):
+        self.scheduled = True
+        self.schedules += 1
+
+
+class FakeDrivetrain:
+    def __init__(self):
+        self.applied = []
+
+    def run(self, fn):
+        return FakeCommand(fn)
+
+    def set_control(self, request):
+        self.applied.append((request.kind, dict(request.values)))
+
+
+def _mailbox(timeout=0.1):
+    requests = {
+        DriveSetpointMailbox.ROBOT_CENTRIC: FakeRequest(DriveSetpointMailbox.ROBOT_CENTRIC),
+        DriveSetpointMailbox.FACING_ANGLE: FakeRequest(DriveSetpointMailbox.FACING_ANGLE)
+    }
+    drivetrain = FakeDrivetrain()
+    return DriveSetpointMailbox(drivetrain, requests, timeout), drivetrain
+
+
+def _apply(mailbox, drivetrain):
+    mailbox.command.fn()
+    return drivetrain.applied[-1]
+
+
+def test_nothing_written_drives_zeros():
+    mailbox, drivetrain = _mailbox()
+    assert _apply(mailbox, drivetrain) == (
+        DriveSetpointMailbox.ROBOT_CENTRIC, {"velocity_x": 0, "velocity_y": 0, "rotational_rate": 0})
+
+
+def test_write_schedules_once_and_applies_setpoint():
+    pauseTiming()
+    try:
+        mailbox, drivetrain = _mailbox()
+        mailbox.write(1.0, 0.5, 0.2)
+        mailbox.write(1.5, 0.5, 0.2)
+        assert mailbox.command.schedules == 1
+
+        stepTiming(0.02)
+        assert _apply(mailbox, drivetrain) == (
+            DriveSetpointMailbox.ROBOT_CENTRIC, {"velocity_x": 1.5, "velocity_y": 0.5, "rotational_rate": 0.2})
+
+        mailbox.write(0.3, -0.1, request_type=DriveSetpointMailbox.FACING_ANGLE, heading="heading")
+        kind, values = _apply(mailbox, drivetrain)
+        assert kind == DriveSetpointMailbox.FACING_ANGLE
+        assert values == {"target_direction": "heading", "velocity_x": 0.3, "velocity_y": -0.1}
+    finally:
+        resumeTiming()
+
+
+def test_stale_setpoint_stops_robot_until_written_again():
+    pauseTiming()
+    try:
+        mailbox, drivetrain = _mailbox(timeout=0.1)
+        mailbox.write(1.0, 0.0, 0.0)
+        stepTiming(0.05)
+        assert _apply(mailbox, drivetrain)[1]["velocity_x"] == 1.0
+        assert not mailbox.stale
+
+        # The writer went quiet for longer than the timeout
+        stepTiming(0.1)
+        assert _apply(mailbox, drivetrain)[1] == {"velocity_x": 0, "velocity_y": 0, "rotational_rate": 0}
+        assert mailbox.stale
+        _apply(mailbox, drivetrain)
+        assert mailbox.stale_count == 1  # Counted once per stale stretch
+
+        mailbox.write(0.5, 0.0, 0.0)
+        assert _apply(mailbox, drivetrain)[1]["velocity_x"] == 0.5
+        assert not mailbox.stale
+    finally:
+        resumeTiming()
@@ -0,0 +1,79 @@
+import math
+from types import SimpleNamespace
+
+from wpimath.geometry import Rotation3d, Transform3d, Translation3d
+
+from handlers.multi_tag import MultiTagEstimator, _weighted_angle
+
+TARGET, NEIGHBOUR, FAR_AWAY = 18, 17, 1
+
+
+def _camera_in_front_of(estimator, tag_id, distance, sideways=0.0):
+    """Camera pose on the field, looking at the tag from distance meters in front of it"""
+    return estimator._tag_poses[tag_id].transformBy(
+        Transform3d(Translation3d(sideways, 0, -distance), Rotation3d(0, math.radians(10), 0)))
+
+
+def _seen(estimator, camera, tag_id, robot_pose=True):
+    """TargetData-like view of the tag from the camera, in Limelight camera space"""
+    pose = estimator._tag_poses[tag_id].relativeTo(camera)
+    t, r = pose.translation(), pose.rotation()
+    distance = t.norm()
+    return SimpleNamespace(
+        tag_id=tag_id, x_pos=t.x, y_pos=t.y, z_pos=t.z,
+        pitch=math.degrees(r.x), yaw=math.degrees(r.y), roll=math.degrees(r.z),
+        tx=math.degrees(math.atan2(t.x, t.z)), ty=-math.degrees(math.atan2(t.y, math.hypot(t.x, t.z))),
+        area=1.0 / distance ** 2, distance=distance, robot_pose=[0.0] * 6 if robot_pose else None)
+
+
+def _assert_pose(estimate, target):
+    _, _, _, pose = estimate
+    expected = (target.x_pos, target.y_pos, target.z_pos, target.pitch, target.yaw, target.roll)
+    for value, wanted in zip(pose, expected):
+        assert math.isclose(value, wanted, abs_tol=1e-6)
+
+
+def test_neighbours():
+    estimator = MultiTagEstimator(2.0)
+    neighbours = estimator.neighbours(TARGET)
+    assert {TARGET, NEIGHBOUR} <= neighbours
+    assert FAR_AWAY not in neighbours
+    assert estimator.neighbours(999) == frozenset((999,))
+
+
+def test_target_estimated_from_neighbour_alone():
+    estimator = MultiTagEstimator(2.0)
+    camera = _camera_in_front_of(estimator, TARGET, 2.0, sideways=0.3)
+    target = _seen(estimator, camera, TARGET)
+
+    estimate = estimator.estimate(TARGET, [_seen(estimator, camera, NEIGHBOUR)])
+    _assert_pose(estimate, target)
+    tx, ty, area, _ = estimate
+    assert math.isclose(tx, target.tx, abs_tol=1e-6)
+    assert math.isclose(ty, target.ty, abs_tol=1e-6)
+    assert area == 0.0  # The target itself isn't in view
+
+
+def test_blend_keeps_consistent_views_and_own_area():
+    estimator = MultiTagEstimator(2.0)
+    camera = _camera_in_front_of(estimator, TARGET, 1.5)
+    target = _seen(estimator, camera, TARGET)
+
+    estimate = estimator.estimate(TARGET, [target, _seen(estimator, camera, NEIGHBOUR)])
+    _assert_pose(estimate, target)
+    assert estimate[2] == target.area
+
+
+def test_tags_without_orientation_or_too_far_are_left_out():
+    estimator = MultiTagEstimator(2.0)
+    camera = _camera_in_front_of(estimator, TARGET, 2.0)
+
+    assert estimator.estimate(TARGET, [_seen(estimator, camera, NEIGHBOUR, robot_pose=False)]) is None
+    assert estimator.estimate(TARGET, [_seen(estimator, camera, FAR_AWAY)]) is None
+    assert estimator.estimate(999, [_seen(estimator, camera, NEIGHBOUR)]) is None
+
+
+def test_weighted_angle_wraps_and_skips_unknown():
+    assert math.isclose(abs(_weighted_angle([170.0, -170.0], [1.0, 1.0])), 180.0)
+    assert math.isclose(_weighted_angle([10.0, math.nan], [1.0, 5.0]), 10.0)
+    assert math.isnan(_weighted_angle([math.nan], [1.0]))
@@ -0,0 +1,87 @@
+from types import SimpleNamespace
+
+from wpilib.simulation import pauseTiming, resumeTiming, stepTiming
+
+from handlers.pipeline_scheduler import PipelineScheduler
+
+NEAR, FAR = 0, 1  # Band positions in LL_PIPELINES["bands"] (near edge 1.8 m, hysteresis 0.25 m)
+
+
+class FakeHandler:
+    def __init__(self):
+        self.switches = []
+        self.frame = None
+        self.pipeline_frame_stats = {}
+        self.ingesting = False
+
+    def start_ingest(self):
+        self.ingesting = True
+
+    def read_results(self):
+        return self.frame
+
+    def pipeline_switch(self, index):
+        self.switches.append(index)
+        self.frame = SimpleNamespace(pipeline_id=index)
+        return True
+
+
+def test_band_edges_need_hysteresis():
+    scheduler = PipelineScheduler(FakeHandler())
+    assert scheduler.band == FAR
+
+    # Inside the near band, but not by the hysteresis yet
+    assert scheduler._band_for_distance(1.7) == FAR
+    assert scheduler._band_for_distance(1.5) == NEAR
+
+    scheduler.band = NEAR
+    assert scheduler._band_for_distance(1.9) == NEAR
+    assert scheduler._band_for_distance(2.1) == FAR
+
+
+def test_switches_are_rate_limited_and_fall_back_when_lost():
+    pauseTiming()
+    try:
+        handler = FakeHandler()
+        scheduler = PipelineScheduler(handler)
+        near_index = scheduler.bands[NEAR]["index"]
+        far_index = scheduler.bands[FAR]["index"]
+
+        stepTiming(1.0)
+        scheduler.update(SimpleNamespace(distance=1.0))
+        assert scheduler.band == NEAR
+        assert handler.switches == [near_index]
+
+        # Far again right away: held until min_switch_interval has passed
+        stepTiming(0.1)
+        scheduler.update(SimpleNamespace(distance=3.0))
+        assert scheduler.band == NEAR
+        stepTiming(0.5)
+        scheduler.update(SimpleNamespace(distance=3.0))
+        assert scheduler.band == FAR
+
+        # Back near, then no tag for longer than lost_after: back to the far band
+        stepTiming(0.6)
+        scheduler.update(SimpleNamespace(distance=1.0))
+        assert scheduler.band == NEAR
+        stepTiming(0.2)
+        scheduler.update(None)
+        assert scheduler.band == NEAR
+        stepTiming(0.6)
+        scheduler.update(None)
+        assert scheduler.band == FAR
+        assert handler.switches == [near_index, far_index, near_index, far_index]
+    finally:
+        resumeTiming()
+
+
+def test_fps_comes_from_handler_frame_arrivals():
+    handler = FakeHandler()
+    scheduler = PipelineScheduler(handler)
+    near_index = scheduler.bands[NEAR]["index"]
+    far_index = scheduler.bands[FAR]["index"]
+    assert handler.ingesting
+
+    # 90 frames in one second: more than the 50 Hz loop could ever have counted
+    handler.pipeline_frame_stats[near_index] = {"frames": 90, "seconds": 1.0}
+    assert scheduler.get_pipeline_fps() == {near_index: 90.0, far_index: 0}
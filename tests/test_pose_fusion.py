@@ -0,0 +1,116 @@
+import math
+from types import SimpleNamespace
+
+from wpimath.geometry import Pose2d, Rotation2d, Translation2d
+from wpimath.kinematics import ChassisSpeeds
+
+from autonomous.auton_constants import POSE_FUSION
+from handlers.pose_fusion import VisionPoseFusion
+
+
+class FakeDrivetrain:
+    def __init__(self, pose=Pose2d(4.0, 3.0, Rotation2d()), omega=0.0):
+        self.pose = pose
+        self.omega = omega
+        self.measurements = []
+        self.reset_to = None
+
+    def get_state(self):
+        return SimpleNamespace(pose=self.pose, speeds=ChassisSpeeds(0, 0, self.omega))
+
+    def add_vision_measurement(self, pose, timestamp, std_devs):
+        self.measurements.append((pose, timestamp, std_devs))
+
+    def reset_translation(self, translation):
+        self.reset_to = translation
+
+
+def _frame(x=4.0, y=3.0, distances=(2.0,), ambiguity=None, megatag2=False):
+    botpose = [x, y, 0.0, 0.0, 0.0, 0.0]
+    fiducials = [
+        SimpleNamespace(target_pose_camera_space=[0.0, 0.0, d, 0.0, 0.0, 0.0], ambiguity=ambiguity)
+        for d in distances
+    ]
+    return SimpleNamespace(validity=1, botpose_wpiblue=botpose, botpose_orb_wpiblue=botpose if megatag2 else [],
+                           fiducialResults=fiducials, capture_time=1.0)
+
+
+def _std_devs(drivetrain, frame):
+    fusion = VisionPoseFusion(drivetrain)
+    fusion.update(frame)
+    assert fusion.accepted == 1
+    return drivetrain.measurements[-1][2]
+
+
+def test_one_tag_at_distance_scale():
+    const = POSE_FUSION["std_devs"]
+    xy, _, theta = _std_devs(FakeDrivetrain(), _frame(distances=(const["distance_scale"],)))
+    # (1 + 1^2) / 1 tag
+    assert math.isclose(xy, const["xy"] * 2)
+    assert theta == const["single_tag_theta"]
+
+
+def test_std_devs_scale_with_distance_tags_ambiguity_and_spin():
+    near = _std_devs(FakeDrivetrain(), _frame(distances=(1.0,)))[0]
+    far = _std_devs(FakeDrivetrain(), _frame(distances=(3.0,)))[0]
+    two_tags = _std_devs(FakeDrivetrain(), _frame(distances=(3.0, 3.0)))[0]
+    ambiguous = _std_devs(FakeDrivetrain(), _frame(distances=(3.0,), ambiguity=0.2))[0]
+    spinning = _std_devs(FakeDrivetrain(omega=2.0), _frame(distances=(3.0,)))[0]
+
+    assert near < far
+    assert math.isclose(two_tags, far / 2)
+    assert ambiguous > far
+    assert spinning > far
+
+
+def test_megatag2_heading_not_fused():
+    const = POSE_FUSION["std_devs"]
+    _, _, theta = _std_devs(FakeDrivetrain(), _frame(distances=(2.0, 2.0), megatag2=True))
+    assert theta == const["single_tag_theta"]
+
+    _, _, theta = _std_devs(FakeDrivetrain(), _frame(distances=(2.0, 2.0)))
+    assert theta < const["single_tag_theta"]
+
+
+def test_rejections():
+    const = POSE_FUSION["reject"]
+    cases = {
+        "no_pose": (FakeDrivetrain(), _frame(x=0.0, y=0.0)),
+        "ambiguity": (FakeDrivetrain(), _frame(ambiguity=const["max_ambiguity"] + 0.1)),
+        "distance": (FakeDrivetrain(), _frame(distances=(const["max_distance"] + 1,))),
+        "spin": (FakeDrivetrain(omega=const["max_angular_velocity"] + 1), _frame()),
+        "jump": (FakeDrivetrain(), _frame(x=4.0 + const["max_jump"] + 0.5)),
+    }
+    for reason, (drivetrain, frame) in cases.items():
+        fusion = VisionPoseFusion(drivetrain)
+        fusion.update(frame)
+        assert fusion.rejections[reason] == 1, reason
+        assert drivetrain.measurements == []
+
+
+def test_ambiguity_ignored_for_megatag2():
+    frame = _frame(ambiguity=POSE_FUSION["reject"]["max_ambiguity"] + 0.1, megatag2=True)
+    fusion = VisionPoseFusion(FakeDrivetrain())
+    fusion.update(frame)
+    assert fusion.accepted == 1
+
+
+def test_same_frame_only_fused_once():
+    drivetrain = FakeDrivetrain()
+    fusion = VisionPoseFusion(drivetrain)
+    frame = _frame()
+    fusion.update(frame)
+    fusion.update(frame)
+    assert len(drivetrain.measurements) == 1
+
+
+def test_repeated_jumps_reset_translation():
+    drivetrain = FakeDrivetrain()
+    fusion = VisionPoseFusion(drivetrain)
+    x = 4.0 + POSE_FUSION["reject"]["max_jump"] + 0.5
+    for _ in range(POSE_FUSION["reject"]["reset_after"]):
+        fusion.update(_frame(x=x))
+
+    assert fusion.rejections["jump"] == POSE_FUSION["reject"]["reset_after"] - 1
+    assert fusion.resets == 1
+    assert drivetrain.reset_to == Translation2d(x, 3.0)
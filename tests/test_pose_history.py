@@ -0,0 +1,74 @@
+import math
+
+from wpimath.geometry import Pose2d, Rotation2d
+
+from handlers.pose_history import PoseHistory
+
+
+def _pose(x, y, degrees):
+    return Pose2d(x, y, Rotation2d.fromDegrees(degrees))
+
+
+def _same_heading(rotation, degrees):
+    return math.isclose((rotation - Rotation2d.fromDegrees(degrees)).degrees(), 0.0, abs_tol=1e-9)
+
+
+def test_interpolates_between_samples():
+    history = PoseHistory()
+    history.add(1.0, _pose(0.0, 0.0, 0.0))
+    history.add(1.1, _pose(1.0, 2.0, 20.0))
+
+    pose = history.sample(1.025)
+    assert math.isclose(pose.x, 0.25)
+    assert math.isclose(pose.y, 0.5)
+    assert _same_heading(pose.rotation(), 5.0)
+
+
+def test_heading_wraps_across_180():
+    history = PoseHistory()
+    history.add(1.0, _pose(0.0, 0.0, 170.0))
+    history.add(1.1, _pose(0.0, 0.0, -170.0))
+
+    # The short way round through 180, not back through 0
+    assert _same_heading(history.sample(1.05).rotation(), 180.0)
+    assert _same_heading(history.sample(1.025).rotation(), 175.0)
+    assert _same_heading(history.sample(1.075).rotation(), -175.0)
+
+
+def test_exact_timestamp_returns_sample():
+    history = PoseHistory()
+    history.add(1.0, _pose(0.0, 0.0, 0.0))
+    history.add(1.1, _pose(1.0, 0.0, 0.0))
+    assert history.sample(1.1).x == 1.0
+    assert history.sample(1.0).x == 0.0
+
+
+def test_before_buffer_is_none_after_buffer_is_latest():
+    history = PoseHistory()
+    assert history.sample(1.0) is None
+    assert history.latest() is None
+
+    history.add(1.0, _pose(0.0, 0.0, 0.0))
+    history.add(1.1, _pose(1.0, 0.0, 0.0))
+
+    assert history.sample(0.99) is None
+    assert history.sample(5.0).x == 1.0
+    assert history.latest() == (1.1, _pose(1.0, 0.0, 0.0))
+
+
+def test_old_samples_dropped():
+    history = PoseHistory(max_age=0.5)
+    for i in range(11):
+        history.add(i * 0.1, _pose(i, 0.0, 0.0))
+
+    # Only the last 0.5 s (plus the edge sample) is kept
+    assert history.sample(0.45) is None
+    assert math.isclose(history.sample(0.55).x, 5.5)
+
+
+def test_out_of_order_samples_ignored():
+    history = PoseHistory()
+    history.add(1.0, _pose(0.0, 0.0, 0.0))
+    history.add(0.9, _pose(9.0, 0.0, 0.0))
+    history.add(1.0, _pose(9.0, 0.0, 0.0))
+    assert history.latest() == (1.0, _pose(0.0, 0.0, 0.0))
@@ -0,0 +1,61 @@
+import math
+from types import SimpleNamespace
+
+from wpimath.geometry import Pose2d, Rotation2d
+
+from handlers.limelight_handler import LimelightHandler
+
+
+def _handler():
+    # Replay transport: no camera, NT source or threads
+    return LimelightHandler(debug=False, transport="replay", replay=SimpleNamespace())
+
+
+def _tag_ahead(handler, distance, yaw=0.0):
+    """Tag straight ahead of the camera at the given distance"""
+    return handler._target_data(18, 0.0, 0.0, 0.5, [0.0, 0.0, distance, 0.0, yaw, 0.0], None)
+
+
+def _assert_mapped_follows(handler, target):
+    m_yaw, m_tx, m_distance = handler._multipliers
+    assert math.isclose(target.mapped.yaw, target.yaw * m_yaw, abs_tol=1e-9)
+    assert math.isclose(target.mapped.tx, target.tx * m_tx, abs_tol=1e-9)
+    assert math.isclose(target.mapped.distance, target.distance * m_distance, abs_tol=1e-9)
+
+
+def test_no_move_is_unchanged():
+    handler = _handler()
+    target = _tag_ahead(handler, 2.0, yaw=5.0)
+    projected = handler.project_target(target, Pose2d())
+    assert math.isclose(projected.tx, 0.0, abs_tol=1e-9)
+    assert math.isclose(projected.yaw, 5.0)
+    assert math.isclose(projected.distance, 2.0)
+
+
+def test_driving_forward_closes_distance():
+    handler = _handler()
+    projected = handler.project_target(_tag_ahead(handler, 2.0), Pose2d(0.5, 0.0, Rotation2d()))
+    assert math.isclose(projected.z_pos, 1.5)
+    assert math.isclose(projected.distance, 1.5)
+    assert math.isclose(projected.tx, 0.0, abs_tol=1e-9)
+    _assert_mapped_follows(handler, projected)
+
+
+def test_moving_left_puts_tag_to_the_right():
+    handler = _handler()
+    projected = handler.project_target(_tag_ahead(handler, 2.0), Pose2d(0.0, 0.5, Rotation2d()))
+    # Camera x is right: the tag shifts right and tx goes positive
+    assert math.isclose(projected.x_pos, 0.5)
+    assert math.isclose(projected.tx, math.degrees(math.atan2(0.5, 2.0)))
+    _assert_mapped_follows(handler, projected)
+
+
+def test_turning_left_moves_tag_right_and_turns_yaw():
+    handler = _handler()
+    projected = handler.project_target(_tag_ahead(handler, 2.0, yaw=5.0), Pose2d(0.0, 0.0, Rotation2d.fromDegrees(10)))
+    assert math.isclose(projected.x_pos, 2.0 * math.sin(math.radians(10)))
+    assert math.isclose(projected.z_pos, 2.0 * math.cos(math.radians(10)))
+    assert math.isclose(projected.tx, 10.0)
+    assert math.isclose(projected.yaw, 15.0)
+    assert math.isclose(projected.distance, 2.0)
+    _assert_mapped_follows(handler, projected)
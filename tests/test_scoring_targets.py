@@ -0,0 +1,78 @@
+import math
+
+import pytest
+from wpimath.geometry import Rotation2d, Transform2d
+
+from autonomous.auton_constants import SCORING
+from handlers.field_layout import get_field_layout
+from handlers.scoring_targets import ScoringPoseTable
+
+TAG = 18
+
+
+@pytest.fixture
+def cache_path(tmp_path, monkeypatch):
+    path = str(tmp_path / "scoring_poses.json")
+    monkeypatch.setitem(SCORING, "cache_path", path)
+    return path
+
+
+def _branch_from_robot(table, side):
+    """The branch's position in the robot frame at the scoring pose (x forward, y left)"""
+    offset = SCORING["poses"]["branch_offset"]
+    tag = get_field_layout().getTagPose(TAG).toPose2d()
+    # The tag's +y is to the right of someone facing it
+    branch = tag.transformBy(Transform2d(0, offset if side == "right" else -offset, Rotation2d()))
+    return branch.translation() - table.scoring_pose(TAG, side).translation()
+
+
+def _robot_frame(table, side):
+    return _branch_from_robot(table, side).rotateBy(-table.scoring_pose(TAG, side).rotation())
+
+
+def test_faces_tag_from_standoff(cache_path):
+    table = ScoringPoseTable()
+    for side in ("left", "right"):
+        pose = table.scoring_pose(TAG, side)
+        assert math.isclose((pose.rotation() - table.heading(TAG)).degrees(), 0.0, abs_tol=1e-9)
+        assert math.isclose(_robot_frame(table, side).x, SCORING["poses"]["standoff"])
+
+        # The line-up pose is straight back from the scoring pose
+        back = table.approach_pose(TAG, side).relativeTo(pose)
+        assert math.isclose(back.x, -SCORING["poses"]["approach_distance"])
+        assert math.isclose(back.y, 0.0, abs_tol=1e-9)
+
+
+def test_left_and_right_branches(cache_path):
+    table = ScoringPoseTable()
+    # With the mechanism on the robot center, the branch is straight ahead
+    assert math.isclose(_robot_frame(table, "left").y, 0.0, abs_tol=1e-9)
+    assert math.isclose(_robot_frame(table, "right").y, 0.0, abs_tol=1e-9)
+
+    # Left branch is on the robot's left as it faces the tag
+    left = table.scoring_pose(TAG, "left").translation()
+    right = table.scoring_pose(TAG, "right").translation()
+    assert math.isclose(left.distance(right), 2 * SCORING["poses"]["branch_offset"])
+    assert (left - right).rotateBy(-table.heading(TAG)).y > 0
+
+
+def test_lateral_offset_puts_mechanism_on_branch(cache_path, monkeypatch):
+    monkeypatch.setitem(SCORING["poses"], "lateral_offset", 0.05)
+    table = ScoringPoseTable()
+    for side in ("left", "right"):
+        # The mechanism sits 0.05 m right of the center (y -0.05), and so must the branch
+        assert math.isclose(_robot_frame(table, side).y, -0.05, abs_tol=1e-9)
+
+
+def test_cache_reused_until_settings_change(cache_path, monkeypatch):
+    built = ScoringPoseTable().table
+
+    def no_build(self):
+        raise AssertionError("rebuilt with an up to date cache")
+
+    monkeypatch.setattr(ScoringPoseTable, "_build", no_build)
+    assert ScoringPoseTable().table == built
+
+    monkeypatch.setitem(SCORING["poses"], "standoff", 0.5)
+    with pytest.raises(AssertionError):
+        ScoringPoseTable()
@@ -0,0 +1,55 @@
+import math
+
+from handlers.limelight_handler import MappedData
+from handlers.signal_filter import AlphaBetaFilter, TargetFilter
+
+NOISE = {"tx": 0.3, "yaw": 0.3, "distance": 0.05}
+
+
+def test_first_measurement_is_taken_as_is():
+    f = AlphaBetaFilter(0.5, 0.1)
+    assert f.update(2.0, 1.0) == 2.0
+    assert f.rate == 0.0
+
+
+def test_tracks_a_ramp():
+    f = AlphaBetaFilter(0.5, 0.1)
+    for i in range(200):
+        f.update(1.0 * i * 0.02, i * 0.02)
+    assert math.isclose(f.rate, 1.0, rel_tol=0.01)
+    assert math.isclose(f.value, 199 * 0.02, abs_tol=0.01)
+
+
+def test_repeated_timestamp_is_ignored():
+    f = AlphaBetaFilter(0.5, 0.1)
+    f.update(1.0, 1.0)
+    assert f.update(5.0, 1.0) == 1.0
+    assert f.updates == 1
+
+
+def test_target_filter_resets_after_gap():
+    target_filter = TargetFilter(0.5, 0.1)
+    target_filter.update(MappedData(id=18, yaw=1.0, tx=1.0, distance=2.0), 1.0, 0.3)
+    target_filter.update(MappedData(id=18, yaw=1.0, tx=1.0, distance=2.0), 1.02, 0.3)
+    target_filter.update(MappedData(id=18, yaw=3.0, tx=3.0, distance=1.0), 2.0, 0.3)
+    assert target_filter.filters["tx"].value == 3.0
+    assert target_filter.filters["tx"].updates == 1
+
+
+def test_unknown_yaw_is_skipped():
+    target_filter = TargetFilter(0.5, 0.1)
+    target_filter.update(MappedData(id=18, yaw=1.0, tx=1.0, distance=2.0), 1.0, 0.3)
+    target_filter.update(MappedData(id=18, yaw=math.nan, tx=1.0, distance=2.0), 1.02, 0.3)
+    assert target_filter.filters["yaw"].value == 1.0
+    assert target_filter.filters["yaw"].updates == 1
+    assert target_filter.filters["tx"].updates == 2
+
+
+def test_confidence_grows_as_the_filter_settles():
+    target_filter = TargetFilter(0.5, 0.1)
+    confidences = []
+    for i in range(4):
+        target_filter.update(MappedData(id=18, yaw=1.0, tx=1.0, distance=2.0), 1.0 + i * 0.02, 0.3)
+        confidences.append(target_filter.confidence(NOISE, 3))
+    assert confidences[0] < confidences[1] < confidences[2]
+    assert math.isclose(confidences[3], 1.0)
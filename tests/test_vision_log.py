@@ -0,0 +1,82 @@
+import math
+from types import SimpleNamespace
+
+from handlers.vision_log import MAGIC, VisionRecorder, read_log
+
+
+def _frame(arrival_time, botpose_orb=None, validity=True):
+    return SimpleNamespace(
+        arrival_time=arrival_time, timestamp=arrival_time * 1000, capture_latency=20.0, targeting_latency=10.0,
+        validity=validity, pipeline_id=1, botpose_wpiblue=[1.0, 2.0, 0.0, 0.0, 0.0, 30.0],
+        botpose_orb_wpiblue=botpose_orb)
+
+
+def _tags():
+    return [
+        (18, 2.5, 1.0, 0.5, 0.05, [0.1, 0.2, 2.0, 1.0, 7.5, 0.5], [0.0, 0.0, -2.0, 0.0, 0.0, 0.0]),
+        # Over NT: no ambiguity, no robot pose, orientation unknown
+        (17, -5.0, 1.0, 0.25, None, [-1.0, 0.2, 3.0, math.nan, math.nan, math.nan], None)
+    ]
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "vision.llv")
+    recorder = VisionRecorder(path, 1 << 20)
+    recorder.write(_frame(1.0, botpose_orb=[3.0, 4.0, 0.0, 0.0, 0.0, 90.0]), _tags())
+    recorder.write(_frame(1.02, validity=False), [])
+    recorder.close()
+
+    frames = read_log(path)
+    assert len(frames) == 2
+
+    first = frames[0]
+    assert first.arrival_time == 1.0
+    assert first.validity == 1
+    assert first.pipeline_id == 1
+    assert first.botpose_wpiblue == [1.0, 2.0, 0.0, 0.0, 0.0, 30.0]
+    assert first.botpose_orb_wpiblue == [3.0, 4.0, 0.0, 0.0, 0.0, 90.0]
+
+    tag, other = first.fiducialResults
+    assert tag.fiducial_id == 18
+    assert math.isclose(tag.target_x_degrees, 2.5)
+    assert math.isclose(tag.ambiguity, 0.05, rel_tol=1e-6)
+    assert math.isclose(tag.target_pose_camera_space[4], 7.5)
+    assert tag.robot_pose_target_space == [0.0, 0.0, -2.0, 0.0, 0.0, 0.0]
+
+    # Missing values come back as None (or empty lists for frame poses), unknown angles as NaN
+    assert other.ambiguity is None
+    assert other.robot_pose_target_space is None
+    assert math.isnan(other.target_pose_camera_space[4])
+
+    second = frames[1]
+    assert second.validity == 0
+    assert second.fiducialResults == []
+    assert second.botpose_orb_wpiblue == []
+
+
+def test_truncated_last_record(tmp_path):
+    path = str(tmp_path / "vision.llv")
+    recorder = VisionRecorder(path, 1 << 20)
+    recorder.write(_frame(1.0), _tags())
+    recorder.write(_frame(1.02), _tags())
+    recorder.close()
+
+    with open(path, "r+b") as f:
+        f.truncate(f.seek(0, 2) - 10)  # Power loss partway through the last tag
+
+    frames = read_log(path)
+    assert len(frames) == 1
+    assert frames[0].arrival_time == 1.0
+
+
+def test_restart_keeps_previous_log(tmp_path):
+    path = str(tmp_path / "vision.llv")
+    recorder = VisionRecorder(path, 1 << 20)
+    recorder.write(_frame(1.0), _tags())
+    recorder.close()
+
+    VisionRecorder(path, 1 << 20).close()
+
+    assert len(read_log(path + ".1")) == 1
+    with open(path, "rb") as f:
+        assert f.read() == MAGIC